@@ -2,8 +2,9 @@
 API中间件
 错误处理、日志、响应格式化
 """
-from flask import jsonify, request
-from functools import wraps
+from flask import Response, jsonify, request
+from functools import lru_cache, wraps
+import json
 import traceback
 import time
 
@@ -17,8 +18,19 @@ def success_response(data=None, message="success", code=200):
     }), code
 
 
+@lru_cache(maxsize=256)
+def _serialized_error(message, code):
+    """序列化不含error字段的错误响应体(与jsonify输出一致)"""
+    body = json.dumps({'code': code, 'message': message}, separators=(',', ':'))
+    return (body + '\n').encode('utf-8')
+
+
 def error_response(message="error", code=400, error=None):
     """错误响应"""
+    # 401/403(登录失败、Token失效等)在攻击流量下最频繁,复用已序列化的响应体
+    if error is None and code in (401, 403) and isinstance(message, str):
+        return Response(_serialized_error(message, code), status=code, mimetype='application/json'), code
+    
     response = {
         'code': code,
         'message': message
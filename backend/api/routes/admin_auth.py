@@ -3,8 +3,9 @@
 """
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from database.models import db, Admin, AdminLoginLog
-from utils.auth import AuthUtils, admin_required
+from utils.auth import AuthUtils, AuthBusyError, admin_required
 from api.middleware import success_response, error_response
 
 admin_auth_bp = Blueprint('admin_auth', __name__, url_prefix='/api/admin')
@@ -26,6 +27,7 @@ def admin_login():
         "success": true,
         "data": {
             "token": "jwt_token",
+            "refresh_token": "jwt_refresh_token",
             "admin": {...}
         }
     }
@@ -53,12 +55,18 @@ def admin_login():
             return error_response('账号已禁用', 403)
         
         # 验证密码
-        if not AuthUtils.verify_password(password, admin.password_hash):
+        if not AuthUtils.verify_password_async(
+            password, admin.password_hash
+        ).result(timeout=AuthUtils.BCRYPT_TIMEOUT):
             log_login_attempt(admin.id, request, 'failed', '密码错误')
             return error_response('用户名或密码错误', 401)
         
+        # 旧哈希成本较低时用当前配置重新加密
+        if AuthUtils.needs_rehash(admin.password_hash):
+            admin.password_hash = AuthUtils.hash_password(password)
+        
         # 生成Token
-        token = AuthUtils.generate_token(
+        tokens = AuthUtils.generate_token_pair(
             user_id=admin.id,
             user_type='admin',
             username=admin.username,
@@ -74,14 +82,72 @@ def admin_login():
         log_login_attempt(admin.id, request, 'success', None)
         
         return success_response({
-            'token': token,
+            'token': tokens['access'],
+            'refresh_token': tokens['refresh'],
             'admin': admin.to_dict()
         }, '登录成功')
         
+    except (AuthBusyError, FuturesTimeoutError):
+        return error_response('服务繁忙，请稍后重试', 503)
     except Exception as e:
         return error_response(f'登录失败: {str(e)}', 500)
 
 
+@admin_auth_bp.route('/refresh', methods=['POST'])
+def admin_refresh_token():
+    """
+    使用刷新Token换取新的访问Token
+    
+    请求体:
+    {
+        "refresh_token": "jwt_refresh_token"
+    }
+    
+    返回:
+    {
+        "success": true,
+        "data": {
+            "token": "jwt_token"
+        }
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        refresh_token = data.get('refresh_token')
+        
+        if not refresh_token:
+            return error_response('未提供刷新Token', 400)
+        
+        try:
+            payload = AuthUtils.decode_refresh_token(refresh_token)
+        except ValueError as e:
+            return error_response(str(e), 401)
+        
+        if payload.get('user_type') != 'admin':
+            return error_response('Token无效', 401)
+        
+        # 重新查询账号状态,禁用的账号不能再换取访问Token
+        admin = Admin.query.get(payload['user_id'])
+        
+        if not admin:
+            return error_response('管理员不存在', 401)
+        
+        if not admin.is_active:
+            return error_response('账号已禁用', 403)
+        
+        token = AuthUtils.generate_token(
+            user_id=admin.id,
+            user_type='admin',
+            username=admin.username,
+            is_super=admin.is_super
+        )
+        
+        return success_response({'token': token}, '刷新成功')
+        
+    except Exception as e:
+        return error_response(f'刷新失败: {str(e)}', 500)
+
+
 @admin_auth_bp.route('/logout', methods=['POST'])
 @admin_required
 def admin_logout(current_admin):
@@ -91,6 +157,11 @@ def admin_logout(current_admin):
     请求头:
     Authorization: Bearer <token>
     
+    请求体(可选):
+    {
+        "refresh_token": "jwt_refresh_token"
+    }
+    
     返回:
     {
         "success": true,
@@ -98,8 +169,14 @@ def admin_logout(current_admin):
     }
     """
     try:
-        # JWT是无状态的，登出只需要前端删除Token
+        # 访问Token和请求体中的刷新Token加入黑名单,直到各自过期
         # 这里可以记录登出日志
+        AuthUtils.invalidate(AuthUtils.get_token_from_request())
+        
+        data = request.get_json(silent=True) or {}
+        refresh_token = data.get('refresh_token')
+        if isinstance(refresh_token, str) and refresh_token:
+            AuthUtils.invalidate(refresh_token)
         return success_response(None, '登出成功')
         
     except Exception as e:
@@ -171,6 +248,8 @@ def change_password(current_admin):
         # 验证新密码长度
         if len(new_password) < 6:
             return error_response('新密码长度不能少于6位', 400)
+        if len(new_password) > AuthUtils.MAX_PASSWORD_LENGTH:
+            return error_response(f'新密码长度不能超过{AuthUtils.MAX_PASSWORD_LENGTH}位', 400)
         
         admin_id = current_admin['user_id']
         admin = Admin.query.get(admin_id)
@@ -179,7 +258,9 @@ def change_password(current_admin):
             return error_response('管理员不存在', 404)
         
         # 验证旧密码
-        if not AuthUtils.verify_password(old_password, admin.password_hash):
+        if not AuthUtils.verify_password_async(
+            old_password, admin.password_hash
+        ).result(timeout=AuthUtils.BCRYPT_TIMEOUT):
             return error_response('旧密码错误', 401)
         
         # 更新密码
@@ -189,6 +270,8 @@ def change_password(current_admin):
         
         return success_response(None, '密码修改成功')
         
+    except (AuthBusyError, FuturesTimeoutError):
+        return error_response('服务繁忙，请稍后重试', 503)
     except Exception as e:
         db.session.rollback()
         return error_response(f'密码修改失败: {str(e)}', 500)
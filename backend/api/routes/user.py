@@ -113,6 +113,8 @@ def update_user(user_id, current_admin=None):
         if 'password' in data:
             password = data.pop('password')
             if password:
+                if len(password) > AuthUtils.MAX_PASSWORD_LENGTH:
+                    return error_response(f'密码长度不能超过{AuthUtils.MAX_PASSWORD_LENGTH}位', 400)
                 # 使用bcrypt加密密码
                 data['password_hash'] = AuthUtils.hash_password(password)
         
@@ -3,8 +3,9 @@
 """
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from database.models import db, User
-from utils.auth import AuthUtils, user_required
+from utils.auth import AuthUtils, AuthBusyError, user_required
 from api.middleware import success_response, error_response
 
 user_auth_bp = Blueprint('user_auth', __name__, url_prefix='/api/auth')
@@ -26,6 +27,7 @@ def user_login():
         "success": true,
         "data": {
             "token": "jwt_token",
+            "refresh_token": "jwt_refresh_token",
             "user": {...}
         }
     }
@@ -56,11 +58,17 @@ def user_login():
             return error_response('账号未设置密码，请联系管理员', 403)
         
         # 验证密码
-        if not AuthUtils.verify_password(password, user.password_hash):
+        if not AuthUtils.verify_password_async(
+            password, user.password_hash
+        ).result(timeout=AuthUtils.BCRYPT_TIMEOUT):
             return error_response('用户名或密码错误', 401)
         
+        # 旧哈希成本较低时用当前配置重新加密
+        if AuthUtils.needs_rehash(user.password_hash):
+            user.password_hash = AuthUtils.hash_password(password)
+        
         # 生成Token
-        token = AuthUtils.generate_token(
+        tokens = AuthUtils.generate_token_pair(
             user_id=user.id,
             user_type='user',
             username=user.username,
@@ -72,14 +80,72 @@ def user_login():
         db.session.commit()
         
         return success_response({
-            'token': token,
+            'token': tokens['access'],
+            'refresh_token': tokens['refresh'],
             'user': user.to_dict()
         }, '登录成功')
         
+    except (AuthBusyError, FuturesTimeoutError):
+        return error_response('服务繁忙，请稍后重试', 503)
     except Exception as e:
         return error_response(f'登录失败: {str(e)}', 500)
 
 
+@user_auth_bp.route('/refresh', methods=['POST'])
+def user_refresh_token():
+    """
+    使用刷新Token换取新的访问Token
+    
+    请求体:
+    {
+        "refresh_token": "jwt_refresh_token"
+    }
+    
+    返回:
+    {
+        "success": true,
+        "data": {
+            "token": "jwt_token"
+        }
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        refresh_token = data.get('refresh_token')
+        
+        if not refresh_token:
+            return error_response('未提供刷新Token', 400)
+        
+        try:
+            payload = AuthUtils.decode_refresh_token(refresh_token)
+        except ValueError as e:
+            return error_response(str(e), 401)
+        
+        if payload.get('user_type') != 'user':
+            return error_response('Token无效', 401)
+        
+        # 重新查询账号状态,禁用的账号不能再换取访问Token
+        user = User.query.get(payload['user_id'])
+        
+        if not user:
+            return error_response('用户不存在', 401)
+        
+        if not user.is_active:
+            return error_response('账号已禁用', 403)
+        
+        token = AuthUtils.generate_token(
+            user_id=user.id,
+            user_type='user',
+            username=user.username,
+            student_id=user.student_id
+        )
+        
+        return success_response({'token': token}, '刷新成功')
+        
+    except Exception as e:
+        return error_response(f'刷新失败: {str(e)}', 500)
+
+
 @user_auth_bp.route('/logout', methods=['POST'])
 @user_required
 def user_logout(current_user):
@@ -89,6 +155,11 @@ def user_logout(current_user):
     请求头:
     Authorization: Bearer <token>
     
+    请求体(可选):
+    {
+        "refresh_token": "jwt_refresh_token"
+    }
+    
     返回:
     {
         "success": true,
@@ -96,7 +167,13 @@ def user_logout(current_user):
     }
     """
     try:
-        # JWT是无状态的，登出只需要前端删除Token
+        # 访问Token和请求体中的刷新Token加入黑名单,直到各自过期
+        AuthUtils.invalidate(AuthUtils.get_token_from_request())
+        
+        data = request.get_json(silent=True) or {}
+        refresh_token = data.get('refresh_token')
+        if isinstance(refresh_token, str) and refresh_token:
+            AuthUtils.invalidate(refresh_token)
         return success_response(None, '登出成功')
         
     except Exception as e:
@@ -168,6 +245,8 @@ def change_user_password(current_user):
         # 验证新密码长度
         if len(new_password) < 6:
             return error_response('新密码长度不能少于6位', 400)
+        if len(new_password) > AuthUtils.MAX_PASSWORD_LENGTH:
+            return error_response(f'新密码长度不能超过{AuthUtils.MAX_PASSWORD_LENGTH}位', 400)
         
         user_id = current_user['user_id']
         user = User.query.get(user_id)
@@ -180,7 +259,9 @@ def change_user_password(current_user):
             return error_response('账号未设置密码，请联系管理员', 403)
         
         # 验证旧密码
-        if not AuthUtils.verify_password(old_password, user.password_hash):
+        if not AuthUtils.verify_password_async(
+            old_password, user.password_hash
+        ).result(timeout=AuthUtils.BCRYPT_TIMEOUT):
             return error_response('旧密码错误', 401)
         
         # 更新密码
@@ -190,6 +271,8 @@ def change_user_password(current_user):
         
         return success_response(None, '密码修改成功')
         
+    except (AuthBusyError, FuturesTimeoutError):
+        return error_response('服务繁忙，请稍后重试', 503)
     except Exception as e:
         db.session.rollback()
         return error_response(f'密码修改失败: {str(e)}', 500)
@@ -226,6 +309,8 @@ def set_initial_password():
         # 验证新密码长度
         if len(new_password) < 6:
             return error_response('密码长度不能少于6位', 400)
+        if len(new_password) > AuthUtils.MAX_PASSWORD_LENGTH:
+            return error_response(f'密码长度不能超过{AuthUtils.MAX_PASSWORD_LENGTH}位', 400)
         
         # 查询用户（必须同时匹配用户名和学号）
         user = User.query.filter_by(
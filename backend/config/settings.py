@@ -36,6 +36,8 @@ class Config:
     # FaceNet人脸识别相关
     FACENET_EMBEDDINGS = MODEL_DIR / 'facenet_embeddings.npz'
     FACENET_SVM = MODEL_DIR / 'facenet_svm.pkl'
+    # 训练时的嵌入向量缓存(按图像内容哈希)
+    FACENET_EMB_CACHE = MODEL_DIR / 'facenet_emb_cache.npz'
     
     # ==================== 模型参数 ====================
     # YOLO检测阈值
@@ -90,6 +92,20 @@ class Config:
     # Flask密钥
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # JWT有效期(秒): 访问Token短期有效,过期后用刷新Token换取新的访问Token
+    ACCESS_TOKEN_EXPIRE_SECONDS = int(os.getenv('ACCESS_TOKEN_EXPIRE_SECONDS', 5 * 60))
+    REFRESH_TOKEN_EXPIRE_SECONDS = int(os.getenv('REFRESH_TOKEN_EXPIRE_SECONDS', 7 * 24 * 3600))
+    
+    # JWT实现: auto(已安装jwt_rs时使用Rust实现,否则PyJWT) / rust / pyjwt
+    JWT_BACKEND = os.getenv('JWT_BACKEND', 'auto').lower()
+    
+    # bcrypt计算成本(2^N轮),低于该值的旧哈希在登录成功时自动升级
+    BCRYPT_COST = int(os.getenv('BCRYPT_COST', '10'))
+    
+    # 多进程部署时共享已验证Token的Memcached地址(host:port,逗号分隔),留空则使用进程内缓存;
+    # 缓存值以SECRET_KEY签名,但Memcached仍应只在内网开放
+    AUTH_CACHE_SERVERS = [s for s in os.getenv('AUTH_CACHE_SERVERS', '').split(',') if s.strip()]
+    
     # ==================== 日志配置 ====================
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -1,11 +1,23 @@
 """训练模块共享工具"""
-from .yolo_detector import YOLOFaceDetector
-from .data_utils import ensure_dir, save_face_image, load_face_images, load_dataset_by_class
+from .yolo_detector import YOLOFaceDetector, get_yolo_detector
+from .video_stream import VideoStream, StopEvent, create_stop_event
+from .data_utils import (
+    ensure_dir,
+    save_face_image,
+    list_image_files,
+    load_face_images,
+    load_dataset_by_class
+)
 
 __all__ = [
     'YOLOFaceDetector',
+    'get_yolo_detector',
+    'VideoStream',
+    'StopEvent',
+    'create_stop_event',
     'ensure_dir',
     'save_face_image', 
+    'list_image_files',
     'load_face_images',
     'load_dataset_by_class'
 ]
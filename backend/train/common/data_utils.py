@@ -5,6 +5,7 @@
 import os
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple, Optional
 import logging
@@ -66,10 +67,63 @@ def save_face_image(
         return False
 
 
+def list_image_files(
+    image_dir: Path or str,
+    extensions: Tuple[str] = ('.jpg', '.jpeg', '.png', '.bmp')
+) -> List[Path]:
+    """
+    列出目录下的图像文件
+    
+    Args:
+        image_dir: 图像目录
+        extensions: 支持的文件扩展名
+    
+    Returns:
+        图像路径列表(按扩展名分组)
+    """
+    image_dir = Path(image_dir)
+    return [
+        img_path
+        for ext in extensions
+        for img_path in image_dir.glob(f"*{ext}")
+    ]
+
+
+def _load_image(
+    img_path: Path,
+    target_size: Optional[Tuple[int, int]] = None
+) -> Optional[np.ndarray]:
+    """
+    读取并解码单张图像(支持中文路径),失败返回None
+    
+    Args:
+        img_path: 图像路径
+        target_size: 目标尺寸(width, height),None则保持原始尺寸
+    """
+    try:
+        img_data = np.fromfile(str(img_path), dtype=np.uint8)
+        img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
+        
+        if img is None:
+            logger.warning(f"无法读取图像: {img_path}")
+            return None
+        
+        # 调整大小
+        if target_size is not None:
+            img = cv2.resize(img, target_size)
+        
+        return img
+        
+    except Exception as e:
+        logger.error(f"加载图像失败 {img_path}: {e}")
+        return None
+
+
 def load_face_images(
     image_dir: Path or str,
     target_size: Optional[Tuple[int, int]] = None,
-    extensions: Tuple[str] = ('.jpg', '.jpeg', '.png', '.bmp')
+    extensions: Tuple[str] = ('.jpg', '.jpeg', '.png', '.bmp'),
+    max_workers: int = 8
 ) -> List[np.ndarray]:
     """
     从目录加载所有人脸图像
@@ -78,37 +132,22 @@ def load_face_images(
         image_dir: 图像目录
         target_size: 目标尺寸(width, height),None则保持原始尺寸
         extensions: 支持的文件扩展名
+        max_workers: 读取线程数(文件读取和cv2.imdecode均释放GIL)
     
     Returns:
         图像数组列表
     """
     image_dir = Path(image_dir)
-    images = []
     
     if not image_dir.exists():
         logger.warning(f"目录不存在: {image_dir}")
-        return images
-    
-    # 遍历目录
-    for ext in extensions:
-        for img_path in image_dir.glob(f"*{ext}"):
-            try:
-                # 读取图像(支持中文路径)
-                img_data = np.fromfile(str(img_path), dtype=np.uint8)
-                img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-                
-                if img is None:
-                    logger.warning(f"无法读取图像: {img_path}")
-                    continue
-                
-                # 调整大小
-                if target_size is not None:
-                    img = cv2.resize(img, target_size)
-                
-                images.append(img)
-                
-            except Exception as e:
-                logger.error(f"加载图像失败 {img_path}: {e}")
+        return []
+    
+    # 并行读取和解码,map保持文件顺序
+    image_paths = list_image_files(image_dir, extensions)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        loaded = executor.map(lambda path: _load_image(path, target_size), image_paths)
+        images = [img for img in loaded if img is not None]
     
     logger.info(f"从 {image_dir} 加载了 {len(images)} 张图像")
     return images
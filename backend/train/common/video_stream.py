@@ -0,0 +1,151 @@
+"""
+摄像头多线程读取封装
+在后台线程中读取摄像头帧,使摄像头I/O与检测推理并行
+"""
+import queue
+import signal
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class VideoStream:
+    """后台线程读取摄像头或视频文件,主循环从队列中取帧"""
+    
+    def __init__(self, src=0, drop_frames: bool = True, buffer_size: int = 64):
+        """
+        初始化视频流
+        
+        Args:
+            src: 摄像头索引或视频文件路径
+            drop_frames: 是否只保留最新一帧(摄像头实时场景);
+                处理视频文件时应为False,解码线程提前缓冲且不丢帧
+            buffer_size: drop_frames为False时的缓冲帧数
+        """
+        self.cap = cv2.VideoCapture(src)
+        self.drop_frames = drop_frames
+        if drop_frames:
+            # 驱动内部只缓冲一帧,避免读到积压的旧帧
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        self._queue = queue.Queue(maxsize=1 if drop_frames else buffer_size)
+        self._stopped = False
+        self._thread = None
+    
+    def isOpened(self) -> bool:
+        """摄像头是否成功打开"""
+        return self.cap.isOpened()
+    
+    def start(self) -> 'VideoStream':
+        """启动后台读取线程"""
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+        return self
+    
+    def _reader(self):
+        """后台线程: 持续读取帧并放入队列"""
+        while not self._stopped:
+            # cap.read()内部释放GIL,不会阻塞主线程推理
+            ret, frame = self.cap.read()
+            
+            if self.drop_frames:
+                # 丢弃尚未被取走的旧帧,只保留最新一帧
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._queue.put((ret, frame))
+            else:
+                # 队列满时等待消费,不丢帧
+                while not self._stopped:
+                    try:
+                        self._queue.put((ret, frame), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            
+            if not ret:
+                break
+    
+    def read(self, timeout: float = 2.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        获取下一帧(每帧只会被取走一次)
+        
+        读取线程仍在运行时持续等待新帧(摄像头偶尔卡顿不会被误判为流结束),
+        只有在视频结束/读取失败或release()之后才返回(False, None)
+        
+        Args:
+            timeout: 每次等待新帧的间隔(秒),超时后检查读取线程状态
+        
+        Returns:
+            (是否成功, 图像帧),接口与cv2.VideoCapture.read()一致
+        """
+        while True:
+            try:
+                return self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if self._stopped or self._thread is None or not self._thread.is_alive():
+                    break
+        
+        # 读取线程可能在退出前刚放入最后一帧
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return False, None
+    
+    def release(self):
+        """停止读取线程并释放摄像头"""
+        self._stopped = True
+        
+        # 清空队列,唤醒可能阻塞在put上的读取线程
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        
+        self.cap.release()
+
+
+class StopEvent(threading.Event):
+    """由SIGINT置位的停止事件,stop()时恢复原来的SIGINT处理函数"""
+    
+    def __init__(self):
+        super().__init__()
+        self._previous_handler = None
+        
+        # signal.signal只能在主线程调用
+        if threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGINT, self._on_sigint)
+    
+    def _on_sigint(self, signum, frame):
+        self.set()
+        # 只拦截第一次Ctrl+C,再次按下时按原处理方式(KeyboardInterrupt)强制退出
+        self._restore_handler()
+    
+    def _restore_handler(self):
+        if self._previous_handler is not None:
+            signal.signal(signal.SIGINT, self._previous_handler)
+            self._previous_handler = None
+    
+    def stop(self):
+        """置位事件并恢复原来的SIGINT处理函数"""
+        self.set()
+        self._restore_handler()
+
+
+def create_stop_event() -> StopEvent:
+    """
+    创建由Ctrl+C(SIGINT)触发的停止事件,用于无界面(headless)模式下退出循环
+    
+    用完后应调用stop()恢复原来的SIGINT处理函数
+    
+    Returns:
+        StopEvent,收到SIGINT后被置位
+    """
+    return StopEvent()
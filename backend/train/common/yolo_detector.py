@@ -5,6 +5,7 @@ YOLO人脸检测器封装
 import cv2
 import numpy as np
 from ultralytics import YOLO
+from pathlib import Path
 from typing import List, Tuple, Optional
 import torch
 
@@ -16,7 +17,8 @@ class YOLOFaceDetector:
         self,
         model_path: str,
         confidence_threshold: float = 0.5,
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        prefer_exported: bool = False
     ):
         """
         初始化YOLO检测器
@@ -25,8 +27,9 @@ class YOLOFaceDetector:
             model_path: YOLO模型文件路径
             confidence_threshold: 检测置信度阈值
             device: 设备('cuda' 或 'cpu'),None则自动选择
+            prefer_exported: 同目录下存在导出的TensorRT(.engine)或ONNX(.onnx)模型时优先使用;
+                默认False,训练等需要与.pt权重结果一致的场景直接加载.pt
         """
-        self.model_path = model_path
         self.confidence_threshold = confidence_threshold
         
         # 自动选择设备
@@ -35,16 +38,60 @@ class YOLOFaceDetector:
         else:
             self.device = device
         
-        # 加载模型
-        self.model = YOLO(model_path)
-        print(f"✓ YOLO模型已加载: {model_path}")
+        if prefer_exported:
+            model_path = self._resolve_exported_model(model_path, self.device)
+        self.model_path = model_path
+        
+        # 加载模型(.engine/.onnx由Ultralytics分别通过TensorRT/ONNX Runtime推理)
+        self.model = YOLO(model_path, task='detect')
+        backend = {'.engine': 'TensorRT', '.onnx': 'ONNX Runtime'}.get(Path(model_path).suffix, 'PyTorch')
+        print(f"✓ YOLO模型已加载: {model_path} ({backend})")
         print(f"✓ 使用设备: {self.device}")
         print(f"✓ 置信度阈值: {self.confidence_threshold}")
     
+    @staticmethod
+    def _resolve_exported_model(model_path: str, device: str) -> str:
+        """
+        查找与.pt权重同名的导出模型
+        
+        TensorRT引擎仅在CUDA下可用;其次使用ONNX模型;
+        导出文件早于.pt权重(重新训练后未重新导出)时忽略;均不可用时返回原路径
+        """
+        path = Path(model_path)
+        if path.suffix != '.pt':
+            return model_path
+        
+        candidates = ['.onnx']
+        if device.startswith('cuda'):
+            candidates.insert(0, '.engine')
+        
+        pt_mtime = path.stat().st_mtime if path.exists() else None
+        for suffix in candidates:
+            exported = path.with_suffix(suffix)
+            if not exported.exists():
+                continue
+            if pt_mtime is not None and exported.stat().st_mtime < pt_mtime:
+                print(f"⚠ 导出模型早于权重文件,已忽略(请重新导出): {exported}")
+                continue
+            return str(exported)
+        
+        return model_path
+    
+    def warmup(self, img_size: int = 640):
+        """
+        用空白图像预热一次推理,避免首帧初始化(CUDA上下文、TensorRT引擎等)的卡顿
+        
+        Args:
+            img_size: 预热图像尺寸
+        """
+        dummy = np.zeros((img_size, img_size, 3), dtype=np.uint8)
+        self.model(dummy, device=self.device, verbose=False)
+    
     def detect_faces(
         self,
         frame: np.ndarray,
-        return_boxes: bool = False
+        return_boxes: bool = False,
+        max_size: Optional[int] = None
     ) -> List[Tuple[int, int, int, int]]:
         """
         检测图像中的人脸
@@ -52,45 +99,73 @@ class YOLOFaceDetector:
         Args:
             frame: 输入图像(BGR格式)
             return_boxes: 是否返回边界框坐标
+            max_size: 检测前将长边缩小到该尺寸,None则使用原图;
+                返回的边界框始终为原图坐标
         
         Returns:
             边界框列表 [(x1, y1, x2, y2), ...]
         """
-        # 运行检测
-        results = self.model(frame, device=self.device)[0]
+        # 大分辨率帧先缩小再检测,检测耗时随像素数下降
+        scale = 1.0
+        if max_size is not None:
+            scale = max_size / max(frame.shape[:2])
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            scale = 1.0
+        
+        # 运行检测(关闭逐帧日志;置信度阈值直接传给NMS,低分框不进入后处理)
+        results = self.model(
+            frame,
+            device=self.device,
+            conf=self.confidence_threshold,
+            verbose=False
+        )[0]
+        
+        return self._parse_boxes(results, scale)
+    
+    def _parse_boxes(self, results, scale: float = 1.0) -> List[Tuple[int, int, int, int]]:
+        """
+        解析YOLO单帧检测结果为边界框列表
+        
+        Args:
+            results: Ultralytics单帧检测结果
+            scale: 检测时的缩放比例,边界框按此还原到原图坐标
         
+        Returns:
+            边界框列表 [(x1, y1, x2, y2), ...]
+        """
         boxes = []
         for result in results.boxes.data.tolist():
             x1, y1, x2, y2, score, class_id = result
             
             # 过滤低置信度检测
             if score > self.confidence_threshold:
-                boxes.append((int(x1), int(y1), int(x2), int(y2)))
+                boxes.append((
+                    int(x1 / scale), int(y1 / scale),
+                    int(x2 / scale), int(y2 / scale)
+                ))
         
         return boxes
     
-    def detect_single_face(
+    def _crop_face(
         self,
         frame: np.ndarray,
+        box: Tuple[int, int, int, int],
         margin: Optional[dict] = None
-    ) -> Optional[np.ndarray]:
+    ) -> np.ndarray:
         """
-        检测单个人脸并裁剪
+        按边界框(及边距)裁剪人脸
         
         Args:
             frame: 输入图像
+            box: 边界框 (x1, y1, x2, y2)
             margin: 边距字典 {'top': int, 'bottom': int, 'left': int, 'right': int}
         
         Returns:
-            裁剪后的人脸图像,如果未检测到则返回None
+            裁剪后的人脸图像
         """
-        boxes = self.detect_faces(frame)
-        
-        if len(boxes) == 0:
-            return None
-        
-        # 只取第一个检测到的人脸
-        x1, y1, x2, y2 = boxes[0]
+        x1, y1, x2, y2 = box
         
         # 应用边距
         if margin is not None:
@@ -109,9 +184,51 @@ class YOLOFaceDetector:
                 y2 = min(h, y2 + margin.get('bottom', 0))
         
         # 裁剪人脸
-        face = frame[y1:y2, x1:x2]
+        return frame[y1:y2, x1:x2]
+    
+    def detect_faces_and_crops(
+        self,
+        frame: np.ndarray,
+        margin: Optional[dict] = None,
+        max_size: Optional[int] = None
+    ) -> Tuple[List[Tuple[int, int, int, int]], List[np.ndarray]]:
+        """
+        检测人脸并同时返回边界框和裁剪结果(只运行一次YOLO推理)
+        
+        Args:
+            frame: 输入图像
+            margin: 边距(整数或字典),仅作用于裁剪结果
+            max_size: 检测时的长边上限,裁剪仍取自原图以保留完整分辨率
         
-        return face
+        Returns:
+            (边界框列表, 裁剪后的人脸图像列表)
+        """
+        boxes = self.detect_faces(frame, max_size=max_size)
+        crops = [self._crop_face(frame, box, margin) for box in boxes]
+        return boxes, crops
+    
+    def detect_single_face(
+        self,
+        frame: np.ndarray,
+        margin: Optional[dict] = None
+    ) -> Optional[np.ndarray]:
+        """
+        检测单个人脸并裁剪
+        
+        Args:
+            frame: 输入图像
+            margin: 边距字典 {'top': int, 'bottom': int, 'left': int, 'right': int}
+        
+        Returns:
+            裁剪后的人脸图像,如果未检测到则返回None
+        """
+        boxes = self.detect_faces(frame)
+        
+        if len(boxes) == 0:
+            return None
+        
+        # 只取第一个检测到的人脸
+        return self._crop_face(frame, boxes[0], margin)
     
     def draw_detections(
         self,
@@ -176,6 +293,41 @@ class YOLOFaceDetector:
         return self.detect_faces(frame)
 
 
+# 进程内YOLO检测器缓存,键为(model_path, confidence_threshold, device)
+_DETECTOR_CACHE = {}
+
+
+def get_yolo_detector(
+    model_path: str,
+    confidence_threshold: float = 0.5,
+    device: Optional[str] = None,
+    prefer_exported: bool = False
+) -> YOLOFaceDetector:
+    """
+    获取缓存的YOLO检测器,同一进程内重复调用不会重新加载模型
+    
+    Args:
+        model_path: YOLO模型文件路径
+        confidence_threshold: 检测置信度阈值
+        device: 设备('cuda' 或 'cpu'),None则自动选择
+        prefer_exported: 是否优先使用导出的TensorRT/ONNX模型
+    
+    Returns:
+        YOLOFaceDetector实例
+    """
+    key = (str(model_path), confidence_threshold, device, prefer_exported)
+    
+    if key not in _DETECTOR_CACHE:
+        _DETECTOR_CACHE[key] = YOLOFaceDetector(
+            model_path=model_path,
+            confidence_threshold=confidence_threshold,
+            device=device,
+            prefer_exported=prefer_exported
+        )
+    
+    return _DETECTOR_CACHE[key]
+
+
 if __name__ == '__main__':
     # 测试代码
     import sys
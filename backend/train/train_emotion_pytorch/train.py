@@ -83,6 +83,10 @@ class EmotionTrainer:
         logger.info(f"总样本数: {len(image_paths)}")
         logger.info(f"类别: {class_names}")
         
+        # 转为numpy数组,分层分割时无需再从list转换
+        image_paths = np.asarray(image_paths, dtype=object)
+        labels = np.asarray(labels, dtype=np.int64)
+        
         # 分割训练集和验证集
         train_paths, val_paths, train_labels, val_labels = train_test_split(
             image_paths,
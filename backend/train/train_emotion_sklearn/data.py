@@ -2,6 +2,7 @@
 数据准备脚本
 从文件夹加载图像并提取MediaPipe特征
 """
+import os
 import sys
 from pathlib import Path
 
@@ -13,6 +14,8 @@ import numpy as np
 import cv2
 from tqdm import tqdm
 import logging
+from config import config
+from train.common import YOLOFaceDetector
 from train.train_emotion_sklearn.utils import (
     FacialLandmarkExtractor,
     preprocess_image_for_mediapipe
@@ -21,11 +24,16 @@ from train.train_emotion_sklearn.utils import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 支持的图像扩展名
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.jfif'}
+
 
 def load_data_from_folders(
     data_dir: str,
     use_normalized: bool = True,
-    output_file: str = "emotion_features.npz"
+    output_file: str = "emotion_features.npz",
+    use_yolo_filter: bool = False,
+    yolo_model_path: str = None
 ):
     """
     从文件夹加载图像并提取特征
@@ -42,6 +50,8 @@ def load_data_from_folders(
         data_dir: 数据目录
         use_normalized: 是否使用归一化特征
         output_file: 输出文件名
+        use_yolo_filter: 是否先用YOLO过滤无人脸图像(跳过MediaPipe并裁剪人脸区域)
+        yolo_model_path: YOLO模型路径,None则使用配置
     """
     logger.info("=" * 60)
     logger.info("MediaPipe特征提取")
@@ -60,7 +70,17 @@ def load_data_from_folders(
     logger.info(f"检测到类别: {class_names}")
     
     # 初始化特征提取器
-    extractor = FacialLandmarkExtractor()
+    extractor = FacialLandmarkExtractor(static_image_mode=True)  # 独立图像
+    
+    # YOLO预过滤: 未检测到人脸的图像直接跳过,不进入开销更大的MediaPipe
+    detector = None
+    if use_yolo_filter:
+        if yolo_model_path is None:
+            yolo_model_path = str(config.YOLO_MODEL)
+        detector = YOLOFaceDetector(
+            model_path=yolo_model_path,
+            confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+        )
     
     X = []  # 特征
     y = []  # 标签
@@ -70,12 +90,13 @@ def load_data_from_folders(
         class_dir = data_path / class_name
         logger.info(f"\n处理类别: {class_name}")
         
-        # 获取所有图像
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.jfif']
-        image_files = []
-        
-        for ext in image_extensions:
-            image_files.extend(class_dir.glob(f'*{ext}'))
+        # 获取所有图像(单次scandir遍历,按后缀过滤)
+        with os.scandir(class_dir) as entries:
+            image_files = [
+                Path(entry.path) for entry in entries
+                if entry.is_file()
+                and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+            ]
         
         logger.info(f"  找到 {len(image_files)} 张图像")
         
@@ -91,6 +112,12 @@ def load_data_from_folders(
                 logger.warning(f"    无法读取: {img_path.name}")
                 continue
             
+            # YOLO检测并裁剪人脸,MediaPipe在紧凑的人脸区域上运行更快
+            if detector is not None:
+                image = detector.detect_single_face(image, margin=config.FACE_MARGIN)
+                if image is None or image.size == 0:
+                    continue
+            
             # 预处理
             image = preprocess_image_for_mediapipe(image)
             
@@ -165,13 +192,19 @@ def main():
         action='store_true',
         help='不使用归一化特征'
     )
+    parser.add_argument(
+        '--yolo_filter',
+        action='store_true',
+        help='使用YOLO预过滤无人脸图像'
+    )
     
     args = parser.parse_args()
     
     load_data_from_folders(
         args.data_dir,
         use_normalized=not args.no_normalize,
-        output_file=args.output
+        output_file=args.output,
+        use_yolo_filter=args.yolo_filter
     )
 
 
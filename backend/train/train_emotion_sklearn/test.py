@@ -9,7 +9,7 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
-import pickle
+import joblib
 import cv2
 import numpy as np
 import logging
@@ -37,8 +37,8 @@ class SklearnEmotionTester:
         
         logger.info(f"加载模型: {model_path}")
         
-        with open(model_path, 'rb') as f:
-            model_data = pickle.load(f)
+        # joblib.load同样兼容旧版pickle保存的模型文件
+        model_data = joblib.load(model_path)
         
         self.svm = model_data['svm']
         self.scaler = model_data['scaler']
@@ -86,8 +86,47 @@ class SklearnEmotionTester:
         
         return emotion_name, confidence
     
-    def test_realtime(self, camera_index: int = 0):
-        """实时测试"""
+    def _draw_emotion(
+        self,
+        display_frame: np.ndarray,
+        emotion: str,
+        confidence: float,
+        box: tuple,
+        color: tuple
+    ):
+        """在画面上绘制情感识别结果"""
+        x1, y1, x2, y2 = box
+        
+        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(
+            display_frame,
+            f"{emotion} ({confidence:.2f})",
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            color,
+            2
+        )
+        
+        cv2.putText(
+            display_frame,
+            f"Emotion: {emotion}",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1.0,
+            color,
+            2
+        )
+    
+    def test_realtime(self, camera_index: int = 0, motion_threshold: float = 2.0):
+        """
+        实时测试
+        
+        Args:
+            camera_index: 摄像头索引
+            motion_threshold: 帧差阈值(64x64灰度图平均绝对差),
+                低于该值时复用上一次的识别结果,不再运行YOLO/MediaPipe/SVM
+        """
         logger.info("=" * 60)
         logger.info("Sklearn情感识别实时测试 (MediaPipe+SVM)")
         logger.info("=" * 60)
@@ -105,16 +144,41 @@ class SklearnEmotionTester:
             'surprised': (0, 255, 255)
         }
         
+        # 上次推理时的缩略灰度图及识别结果 (emotion, confidence, box)
+        ref_gray = None
+        cached_result = None
+        
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
             
-            # 检测人脸
-            face = self.detector.detect_single_face(frame, margin=config.FACE_MARGIN)
-            
             display_frame = frame.copy()
             
+            # 画面基本静止时直接复用缓存结果
+            cur_gray = cv2.cvtColor(cv2.resize(frame, (64, 64)), cv2.COLOR_BGR2GRAY)
+            if (
+                cached_result is not None
+                and np.mean(cv2.absdiff(ref_gray, cur_gray)) < motion_threshold
+            ):
+                emotion, confidence, box = cached_result
+                color = emotion_colors.get(emotion, (255, 255, 255))
+                self._draw_emotion(display_frame, emotion, confidence, box, color)
+                
+                cv2.imshow('Sklearn Emotion Recognition Test', display_frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            
+            ref_gray = cur_gray
+            cached_result = None
+            
+            # 检测人脸(一次推理同时得到边界框和裁剪结果)
+            boxes, crops = self.detector.detect_faces_and_crops(
+                frame, margin=config.FACE_MARGIN
+            )
+            face = crops[0] if crops else None
+            
             if face is not None:
                 try:
                     # 预测情感
@@ -122,32 +186,11 @@ class SklearnEmotionTester:
                     
                     if emotion is not None:
                         # 绘制结果
-                        boxes = self.detector.detect_faces(frame)
-                        if boxes:
-                            x1, y1, x2, y2 = boxes[0]
-                            
-                            color = emotion_colors.get(emotion, (255, 255, 255))
-                            
-                            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
-                            cv2.putText(
-                                display_frame,
-                                f"{emotion} ({confidence:.2f})",
-                                (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.7,
-                                color,
-                                2
-                            )
-                            
-                            cv2.putText(
-                                display_frame,
-                                f"Emotion: {emotion}",
-                                (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                1.0,
-                                color,
-                                2
-                            )
+                        color = emotion_colors.get(emotion, (255, 255, 255))
+                        self._draw_emotion(
+                            display_frame, emotion, confidence, boxes[0], color
+                        )
+                        cached_result = (emotion, confidence, boxes[0])
                     else:
                         cv2.putText(
                             display_frame,
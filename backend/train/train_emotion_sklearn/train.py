@@ -10,11 +10,11 @@ backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
 import numpy as np
-import pickle
+import joblib
 from sklearn.svm import SVC
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.pipeline import Pipeline
 import logging
 
 from config import config
@@ -88,48 +88,69 @@ class SklearnEmotionTrainer:
         logger.info(f"测试集: {len(X_test)} 样本")
         logger.info(f"特征维度: {X_train.shape[1]}")
         
-        # 标准化特征
-        logger.info("\n标准化特征...")
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
         # 训练SVM
+        # cache_size: libsvm核缓存(默认200MB偏小); 样本量较小时shrinking启发式反而增加开销
         if use_grid_search:
             logger.info("\n使用网格搜索优化参数...")
+            # 使用Pipeline保证每折交叉验证都重新拟合标准化器
+            pipeline = Pipeline([
+                ('scaler', StandardScaler()),
+                ('svm', SVC(
+                    probability=True,
+                    cache_size=1024,
+                    shrinking=False,
+                    random_state=42
+                ))
+            ])
             param_grid = {
-                'C': [0.1, 1, 10, 100],
-                'gamma': ['scale', 'auto', 0.001, 0.01],
-                'kernel': ['rbf', 'linear']
+                'svm__C': [0.1, 1, 10, 100],
+                'svm__gamma': ['scale', 'auto', 0.001, 0.01],
+                'svm__kernel': ['rbf', 'linear']
             }
             
-            svm = SVC(probability=True, random_state=42)
             grid_search = GridSearchCV(
-                svm,
+                pipeline,
                 param_grid,
                 cv=5,
                 n_jobs=-1,
                 verbose=2
             )
             
-            grid_search.fit(X_train_scaled, y_train)
-            self.svm = grid_search.best_estimator_
+            grid_search.fit(X_train, y_train)
+            self.scaler = grid_search.best_estimator_.named_steps['scaler']
+            self.svm = grid_search.best_estimator_.named_steps['svm']
             
             logger.info(f"\n最佳参数: {grid_search.best_params_}")
         else:
+            # 标准化特征
+            logger.info("\n标准化特征...")
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            
             logger.info("\n训练SVM (默认参数)...")
             self.svm = SVC(
                 kernel='rbf',
                 C=10,
                 gamma='scale',
                 probability=True,
+                cache_size=1024,
+                shrinking=False,
                 random_state=42
             )
             self.svm.fit(X_train_scaled, y_train)
         
+        X_test_scaled = self.scaler.transform(X_test)
+        
         # 评估
         logger.info("\n评估模型...")
         y_pred = self.svm.predict(X_test_scaled)
-        accuracy = accuracy_score(y_test, y_pred)
+        
+        # 一次bincount得到混淆矩阵,其余指标均由其推导
+        num_classes = len(self.class_names)
+        cm = np.bincount(
+            num_classes * np.asarray(y_test, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64),
+            minlength=num_classes * num_classes
+        ).reshape(num_classes, num_classes)
+        accuracy = cm.trace() / max(cm.sum(), 1)
         
         logger.info("\n" + "=" * 60)
         logger.info("训练完成!")
@@ -138,17 +159,43 @@ class SklearnEmotionTrainer:
         
         # 详细报告
         logger.info("\n分类报告:")
-        logger.info("\n" + classification_report(
-            y_test, y_pred,
-            target_names=self.class_names
-        ))
+        logger.info("\n" + self._format_report(cm))
         
         logger.info("混淆矩阵:")
-        cm = confusion_matrix(y_test, y_pred)
         logger.info(f"\n{cm}")
         
         return accuracy
     
+    def _format_report(self, cm: np.ndarray) -> str:
+        """
+        根据混淆矩阵生成分类报告
+        
+        Args:
+            cm: 混淆矩阵 (K, K), 行为真实标签, 列为预测标签
+        
+        Returns:
+            格式化的报告文本
+        """
+        tp = cm.diagonal().astype(np.float64)
+        support = cm.sum(axis=1)
+        predicted = cm.sum(axis=0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.nan_to_num(tp / predicted)
+            recall = np.nan_to_num(tp / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        
+        width = max(len(str(name)) for name in self.class_names)
+        width = max(width, len('macro avg'))
+        lines = [f"{'':>{width}}  precision    recall  f1-score   support"]
+        for name, p, r, f, n in zip(self.class_names, precision, recall, f1, support):
+            lines.append(f"{str(name):>{width}}  {p:9.2f} {r:9.2f} {f:9.2f} {n:9d}")
+        lines.append(
+            f"{'macro avg':>{width}}  {precision.mean():9.2f} {recall.mean():9.2f} "
+            f"{f1.mean():9.2f} {support.sum():9d}"
+        )
+        return "\n".join(lines)
+    
     def save_model(self):
         """保存模型"""
         save_path = config.EMOTION_SVM_SKLEARN
@@ -159,8 +206,8 @@ class SklearnEmotionTrainer:
             'class_names': self.class_names
         }
         
-        with open(save_path, 'wb') as f:
-            pickle.dump(model_data, f)
+        # joblib对numpy数组(支持向量等)序列化更紧凑,加载也更快
+        joblib.dump(model_data, save_path, compress=3)
         
         logger.info(f"\n模型已保存: {save_path}")
 
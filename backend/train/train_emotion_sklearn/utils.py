@@ -10,30 +10,106 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    from numba import njit
+except ImportError:  # numba为可选依赖,未安装时使用NumPy实现
+    njit = None
+
+
+def _normalize_landmarks_numpy(landmarks_3d: np.ndarray) -> np.ndarray:
+    """关键点归一化(NumPy实现): 平移到中心点并缩放到[-1, 1]"""
+    # 计算中心点并平移到原点
+    landmarks_centered = landmarks_3d - np.mean(landmarks_3d, axis=0)
+    
+    # 计算最大距离并缩放到[-1, 1]
+    max_dist = np.max(np.abs(landmarks_centered))
+    if max_dist > 0:
+        landmarks_centered /= max_dist
+    
+    return landmarks_centered
+
+
+def _normalize_landmarks_loops(landmarks_3d):
+    """关键点归一化(循环实现,供numba编译): 三次遍历,无中间临时数组"""
+    n = landmarks_3d.shape[0]
+    
+    # 1. 计算中心点
+    cx = 0.0
+    cy = 0.0
+    cz = 0.0
+    for i in range(n):
+        cx += landmarks_3d[i, 0]
+        cy += landmarks_3d[i, 1]
+        cz += landmarks_3d[i, 2]
+    cx /= n
+    cy /= n
+    cz /= n
+    
+    # 2. 平移到原点,同时记录最大距离
+    out = np.empty_like(landmarks_3d)
+    max_dist = 0.0
+    for i in range(n):
+        out[i, 0] = landmarks_3d[i, 0] - cx
+        out[i, 1] = landmarks_3d[i, 1] - cy
+        out[i, 2] = landmarks_3d[i, 2] - cz
+        for j in range(3):
+            if abs(out[i, j]) > max_dist:
+                max_dist = abs(out[i, j])
+    
+    # 3. 缩放到[-1, 1]
+    if max_dist > 0:
+        for i in range(n):
+            for j in range(3):
+                out[i, j] /= max_dist
+    
+    return out
+
+
+if njit is not None:
+    _normalize_landmarks = njit(cache=True, fastmath=True)(_normalize_landmarks_loops)
+else:
+    _normalize_landmarks = _normalize_landmarks_numpy
+
 
 class FacialLandmarkExtractor:
     """面部特征点提取器(使用MediaPipe)"""
     
     def __init__(
         self,
-        static_image_mode: bool = True,
+        static_image_mode: bool = False,
         max_num_faces: int = 1,
-        min_detection_confidence: float = 0.5
+        min_detection_confidence: float = 0.5,
+        min_tracking_confidence: float = 0.4
     ):
         """
         初始化MediaPipe面部网格检测器
         
         Args:
-            static_image_mode: 静态图像模式
+            static_image_mode: 静态图像模式。默认False(视频模式),
+                复用上一帧的人脸区域跟踪,大部分帧跳过检测;
+                批量处理互不相关的图像时应传入True
             max_num_faces: 最大检测人脸数
             min_detection_confidence: 最小检测置信度
+            min_tracking_confidence: 最小跟踪置信度(仅视频模式生效)
+        
+        情感识别只使用468点网格,显式关闭虹膜细化子模型(refine_landmarks)
         """
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=static_image_mode,
             max_num_faces=max_num_faces,
-            min_detection_confidence=min_detection_confidence
+            refine_landmarks=False,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
         )
+        
+        # 几何特征使用的关键点对(起点, 终点)
+        # 左眼宽度, 右眼宽度, 嘴巴宽度, 脸部中线
+        self._key_p1 = np.array([33, 362, 61, 0], dtype=np.int32)
+        self._key_p2 = np.array([133, 263, 291, 17], dtype=np.int32)
+        
+        # BGR->RGB转换的复用缓冲区,避免每帧重新分配
+        self._rgb_buf = None
     
     def extract_landmarks(self, image: np.ndarray) -> Optional[np.ndarray]:
         """
@@ -46,8 +122,31 @@ class FacialLandmarkExtractor:
             468个关键点坐标 (x, y, z) -> shape: (468, 3) -> flatten to (1404,)
             如果检测失败返回None
         """
-        # 转RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # 转RGB(写入复用缓冲区,尺寸变化时才重新分配)
+        if self._rgb_buf is None or self._rgb_buf.shape != image.shape:
+            self._rgb_buf = np.empty_like(image)
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        
+        return self.extract_landmarks_rgb(image_rgb)
+    
+    def extract_landmarks_rgb(self, image_rgb: np.ndarray) -> Optional[np.ndarray]:
+        """
+        从RGB图像提取面部关键点(调用方已持有RGB图像时可跳过颜色转换)
+        
+        Args:
+            image_rgb: RGB图像
+        
+        Returns:
+            关键点 (1404,), 如果检测失败返回None
+        """
+        # 裁剪等得到的非连续数组先转为连续内存,避免MediaPipe内部再拷贝
+        if not image_rgb.flags['C_CONTIGUOUS']:
+            image_rgb = np.ascontiguousarray(image_rgb)
+        
+        # 以只读视图传入,MediaPipe可按引用使用数据;
+        # 使用视图而不修改原数组标志,复用的RGB缓冲区仍可被cvtColor写入
+        image_rgb = image_rgb.view()
+        image_rgb.flags.writeable = False
         
         # 检测
         results = self.face_mesh.process(image_rgb)
@@ -58,14 +157,13 @@ class FacialLandmarkExtractor:
         # 获取第一个人脸的关键点
         face_landmarks = results.multi_face_landmarks[0]
         
-        # 提取坐标
-        landmarks = []
-        for landmark in face_landmarks.landmark:
-            landmarks.append([landmark.x, landmark.y, landmark.z])
-        
-        # 转换为numpy数组并展平
-        landmarks_array = np.array(landmarks, dtype=np.float32)
-        landmarks_flat = landmarks_array.flatten()  # (468, 3) -> (1404,)
+        # 提取坐标,直接写入展平的float32数组 (468, 3) -> (1404,)
+        landmarks = face_landmarks.landmark
+        landmarks_flat = np.fromiter(
+            (v for lm in landmarks for v in (lm.x, lm.y, lm.z)),
+            dtype=np.float32,
+            count=len(landmarks) * 3
+        )
         
         return landmarks_flat
     
@@ -93,20 +191,8 @@ class FacialLandmarkExtractor:
         # reshape回(468, 3)
         landmarks_3d = landmarks.reshape(468, 3)
         
-        # 计算中心点
-        center = np.mean(landmarks_3d, axis=0)
-        
-        # 平移到原点
-        landmarks_centered = landmarks_3d - center
-        
-        # 计算最大距离
-        max_dist = np.max(np.abs(landmarks_centered))
-        
-        # 缩放到[-1, 1]
-        if max_dist > 0:
-            landmarks_normalized = landmarks_centered / max_dist
-        else:
-            landmarks_normalized = landmarks_centered
+        # 平移、缩放归一化(安装numba时为JIT编译的融合循环)
+        landmarks_normalized = _normalize_landmarks(landmarks_3d)
         
         # 展平
         return landmarks_normalized.flatten()
@@ -130,21 +216,10 @@ class FacialLandmarkExtractor:
         
         landmarks_3d = landmarks.reshape(468, 3)
         
-        features = []
-        
-        # 1. 选择关键点对,计算距离
+        # 1. 选择关键点对,计算距离(向量化,关键点对定义见__init__)
         # 例如: 眼睛宽度, 嘴巴宽度, 眉毛高度等
-        key_pairs = [
-            (33, 133),   # 左眼宽度
-            (362, 263),  # 右眼宽度
-            (61, 291),   # 嘴巴宽度
-            (0, 17),     # 脸部中线
-            # 可以添加更多关键点对
-        ]
-        
-        for p1, p2 in key_pairs:
-            dist = np.linalg.norm(landmarks_3d[p1] - landmarks_3d[p2])
-            features.append(dist)
+        diffs = landmarks_3d[self._key_p1] - landmarks_3d[self._key_p2]
+        features = np.linalg.norm(diffs, axis=1)
         
         # 2. 归一化(使用整个人脸的尺度)
         face_scale = np.linalg.norm(
@@ -152,17 +227,18 @@ class FacialLandmarkExtractor:
         )
         
         if face_scale > 0:
-            features = [f / face_scale for f in features]
+            features /= face_scale
         
         # 目前只实现了简单的距离特征
         # 可以扩展为包含角度、面积等
         
-        return np.array(features, dtype=np.float32)
+        return features.astype(np.float32, copy=False)
     
     def visualize_landmarks(
         self,
         image: np.ndarray,
-        landmarks: np.ndarray = None
+        landmarks: np.ndarray = None,
+        radius: int = 1
     ) -> np.ndarray:
         """
         可视化面部关键点
@@ -170,6 +246,7 @@ class FacialLandmarkExtractor:
         Args:
             image: 原始图像
             landmarks: 关键点 (1404,), 如果为None则重新检测
+            radius: 关键点半径,<=1时直接批量设置像素,>1时逐点绘制圆
         
         Returns:
             绘制了关键点的图像
@@ -184,11 +261,18 @@ class FacialLandmarkExtractor:
         vis_image = image.copy()
         h, w = image.shape[:2]
         
+        # 关键点转换为像素坐标
+        pts = (landmarks_3d[:, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32)
+        
         # 绘制关键点
-        for landmark in landmarks_3d:
-            x = int(landmark[0] * w)
-            y = int(landmark[1] * h)
-            cv2.circle(vis_image, (x, y), 1, (0, 255, 0), -1)
+        if radius <= 1:
+            # 单像素点: 一次花式索引设置全部像素(与cv2.circle一致,跳过画面外的关键点)
+            xs, ys = pts[:, 0], pts[:, 1]
+            inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            vis_image[ys[inside], xs[inside]] = (0, 255, 0)
+        else:
+            for x, y in pts:
+                cv2.circle(vis_image, (int(x), int(y)), radius, (0, 255, 0), -1)
         
         return vis_image
     
@@ -228,7 +312,7 @@ if __name__ == '__main__':
     # 测试特征提取器
     logging.basicConfig(level=logging.INFO)
     
-    extractor = FacialLandmarkExtractor()
+    extractor = FacialLandmarkExtractor(static_image_mode=True)
     
     # 创建测试图像
     test_image = np.zeros((480, 640, 3), dtype=np.uint8)
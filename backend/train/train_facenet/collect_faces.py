@@ -12,7 +12,13 @@ backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
 from config import config
-from train.common import YOLOFaceDetector, ensure_dir, save_face_image
+from train.common import (
+    get_yolo_detector,
+    VideoStream,
+    create_stop_event,
+    ensure_dir,
+    save_face_image
+)
 
 # 配置日志
 logging.basicConfig(
@@ -21,6 +27,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 检测时帧长边上限(缩小后检测,裁剪仍使用原始分辨率)
+DETECT_MAX_SIZE = 640
+
 
 def collect_faces_for_user(
     user_name: str,
@@ -28,7 +37,9 @@ def collect_faces_for_user(
     camera_index: int = 0,
     save_dir: str = "dataset",
     yolo_model_path: str = None,
-    face_size: tuple = None
+    face_size: tuple = None,
+    video_path: str = None,
+    headless: bool = False
 ):
     """
     为指定用户采集人脸图像
@@ -40,6 +51,8 @@ def collect_faces_for_user(
         save_dir: 保存根目录
         yolo_model_path: YOLO模型路径
         face_size: 人脸尺寸(width, height)
+        video_path: 视频文件路径,提供时从视频采集而不是摄像头
+        headless: 无界面模式,不显示画面,按Ctrl+C结束
     """
     if num_images is None:
         num_images = config.REGISTER_FACE_COUNT
@@ -59,22 +72,34 @@ def collect_faces_for_user(
     logger.info("\n操作说明:")
     logger.info("  - 面对摄像头,保持不同角度和表情")
     logger.info("  - 系统会自动间隔采集")
-    logger.info("  - 按 'q' 提前退出\n")
+    logger.info("  - 按 'q' 提前退出(无界面模式按 Ctrl+C)\n")
     
     # 创建保存目录
     user_dir = ensure_dir(Path(save_dir) / user_name)
     
-    # 初始化YOLO检测器
-    detector = YOLOFaceDetector(
+    # 初始化YOLO检测器(进程内缓存,采集多个用户时不重复加载;优先使用导出模型)
+    detector = get_yolo_detector(
         model_path=yolo_model_path,
-        confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+        confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD,
+        prefer_exported=True
     )
     
-    # 打开摄像头
-    cap = cv2.VideoCapture(camera_index)
+    # 打开摄像头(后台线程读取帧)
+    # 视频文件: 解码线程提前缓冲且不丢帧,解码与检测并行
+    if video_path is not None:
+        cap = VideoStream(video_path, drop_frames=False)
+        source_name = f"视频 {video_path}"
+    else:
+        cap = VideoStream(camera_index)
+        source_name = f"摄像头 {camera_index}"
     if not cap.isOpened():
-        logger.error(f"无法打开摄像头 {camera_index}")
+        logger.error(f"无法打开{source_name}")
+        cap.release()
         return False
+    cap.start()
+    
+    # 无界面模式下由SIGINT触发退出
+    stop_event = create_stop_event() if headless else None
     
     saved_count = 0
     frame_interval = 0  # 帧间隔计数器
@@ -85,33 +110,17 @@ def collect_faces_for_user(
     while saved_count < num_images:
         ret, frame = cap.read()
         if not ret:
-            logger.error("无法读取摄像头帧")
+            logger.error(f"无法读取{source_name}的帧")
             break
         
-        # 检测人脸
-        face_region = detector.detect_single_face(frame, margin=config.FACE_MARGIN)
-        
-        # 显示信息
-        display_frame = frame.copy()
-        info_text = f"User: {user_name} | Saved: {saved_count}/{num_images}"
-        cv2.putText(
-            display_frame,
-            info_text,
-            (10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.8,
-            (0, 255, 0),
-            2
+        # 检测人脸(一次推理同时得到边界框和裁剪结果)
+        boxes, crops = detector.detect_faces_and_crops(
+            frame, margin=config.FACE_MARGIN, max_size=DETECT_MAX_SIZE
         )
+        face_region = crops[0] if crops else None
         
+        # 间隔采集(先保存,再在frame上绘制标注,避免标注混入人脸裁剪区域)
         if face_region is not None:
-            # 绘制检测框
-            boxes = detector.detect_faces(frame)
-            if boxes:
-                x1, y1, x2, y2 = boxes[0]
-                cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
-            # 间隔采集
             if frame_interval == 0:
                 # 调整大小
                 face_resized = cv2.resize(face_region, face_size)
@@ -128,11 +137,35 @@ def collect_faces_for_user(
                     logger.warning(f"保存失败: {filename}")
             else:
                 frame_interval -= 1
+        
+        # 无界面模式: 跳过绘制和显示
+        if headless:
+            if stop_event.is_set():
+                logger.warning("用户中断采集")
+                break
+            continue
+        
+        # 显示信息(直接绘制在frame上,每帧都是新读取的,无需拷贝)
+        info_text = f"User: {user_name} | Saved: {saved_count}/{num_images}"
+        cv2.putText(
+            frame,
+            info_text,
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 255, 0),
+            2
+        )
+        
+        if face_region is not None:
+            # 绘制检测框
+            x1, y1, x2, y2 = boxes[0]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             
             # 显示状态
             status_text = "Capturing..." if frame_interval == 0 else f"Wait {frame_interval}"
             cv2.putText(
-                display_frame,
+                frame,
                 status_text,
                 (10, 70),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -143,7 +176,7 @@ def collect_faces_for_user(
         else:
             # 未检测到人脸
             cv2.putText(
-                display_frame,
+                frame,
                 "No face detected",
                 (10, 70),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -153,7 +186,7 @@ def collect_faces_for_user(
             )
         
         # 显示画面
-        cv2.imshow('Face Collection', display_frame)
+        cv2.imshow('Face Collection', frame)
         
         # 按键控制
         key = cv2.waitKey(1) & 0xFF
@@ -163,7 +196,10 @@ def collect_faces_for_user(
     
     # 释放资源
     cap.release()
-    cv2.destroyAllWindows()
+    if headless:
+        stop_event.stop()
+    else:
+        cv2.destroyAllWindows()
     
     # 总结
     logger.info("\n" + "=" * 60)
@@ -226,6 +262,10 @@ if __name__ == '__main__':
                         help='采集数量')
     parser.add_argument('--camera', type=int, default=0,
                         help='摄像头索引')
+    parser.add_argument('--video', type=str, default=None,
+                        help='视频文件路径(从录制视频中采集)')
+    parser.add_argument('--headless', action='store_true',
+                        help='无界面模式(不显示画面)')
     parser.add_argument('--interactive', action='store_true',
                         help='交互模式(采集多个用户)')
     
@@ -239,5 +279,7 @@ if __name__ == '__main__':
         collect_faces_for_user(
             user_name=args.user,
             num_images=args.num,
-            camera_index=args.camera
+            camera_index=args.camera,
+            video_path=args.video,
+            headless=args.headless
         )
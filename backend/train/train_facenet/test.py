@@ -2,21 +2,26 @@
 FaceNet人脸识别测试脚本
 实时测试训练好的FaceNet+SVM模型
 """
+import os
+import joblib
 import numpy as np
-import pickle
 import torch
+import torch.nn.functional as F
 import cv2
 import logging
 import sys
 from pathlib import Path
+from typing import List
 
 # 添加backend目录到路径
 backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
 from facenet_pytorch import InceptionResnetV1
+from scipy.special import expit
+from sklearn.svm import LinearSVC
 from config import config
-from train.common import YOLOFaceDetector
+from train.common import get_yolo_detector, VideoStream, create_stop_event
 
 # 配置日志
 logging.basicConfig(
@@ -25,6 +30,77 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 检测时帧长边上限(缩小后检测,裁剪仍使用原始分辨率)
+DETECT_MAX_SIZE = 640
+
+# 进程内模型缓存,重复创建测试器时无需重新加载
+_MODEL_CACHE = {}
+
+
+def _compile_facenet(facenet: torch.nn.Module, device: torch.device) -> torch.nn.Module:
+    """
+    针对固定160x160输入编译FaceNet,并预热一次避免首帧卡顿
+    
+    优先使用torch.compile,失败时退回TorchScript trace,均失败则保持eager模式
+    """
+    dtype = next(facenet.parameters()).dtype
+    dummy = torch.zeros((1, 3, *config.FACE_SIZE[::-1]), device=device, dtype=dtype)
+    if device.type == 'cuda':
+        dummy = dummy.contiguous(memory_format=torch.channels_last)
+    
+    if hasattr(torch, 'compile'):
+        try:
+            compiled = torch.compile(facenet, mode='reduce-overhead', fullgraph=True)
+            with torch.inference_mode():
+                compiled(dummy)
+            logger.info("✓ FaceNet已通过torch.compile编译")
+            return compiled
+        except Exception as e:
+            logger.warning(f"torch.compile不可用,尝试TorchScript: {e}")
+    
+    try:
+        with torch.no_grad():
+            traced = torch.jit.trace(facenet, dummy)
+            traced = torch.jit.optimize_for_inference(traced)
+            traced(dummy)
+        logger.info("✓ FaceNet已通过TorchScript优化")
+        return traced
+    except Exception as e:
+        logger.warning(f"TorchScript优化失败,使用eager模式: {e}")
+    
+    return facenet
+
+
+def _get_facenet(device: torch.device) -> InceptionResnetV1:
+    """获取缓存的FaceNet模型(按设备缓存)"""
+    key = ('facenet', str(device))
+    
+    if key not in _MODEL_CACHE:
+        logger.info("加载FaceNet模型...")
+        facenet = InceptionResnetV1(pretrained='vggface2').eval().to(device)
+        
+        # GPU上使用FP16 + channels_last,提升卷积吞吐
+        if device.type == 'cuda':
+            facenet = facenet.half().to(memory_format=torch.channels_last)
+        
+        _MODEL_CACHE[key] = _compile_facenet(facenet, device)
+        logger.info("✓ FaceNet已加载")
+    
+    return _MODEL_CACHE[key]
+
+
+def _load_svm(svm_path: str):
+    """加载SVM模型文件(按路径和修改时间缓存,文件更新后自动重新加载)"""
+    key = ('svm', str(Path(svm_path).resolve()), os.path.getmtime(svm_path))
+    
+    if key not in _MODEL_CACHE:
+        logger.info(f"加载SVM模型: {svm_path}")
+        # joblib格式的模型可直接内存映射numpy数组(支持向量等);
+        # 普通pickle文件同样可以加载
+        _MODEL_CACHE[key] = joblib.load(svm_path, mmap_mode='r')
+    
+    return _MODEL_CACHE[key]
+
 
 class FaceRecognitionTester:
     """人脸识别测试器"""
@@ -53,21 +129,21 @@ class FaceRecognitionTester:
         
         logger.info(f"使用设备: {self.device}")
         
-        # 加载YOLO
-        self.detector = YOLOFaceDetector(
+        # 加载YOLO(实时场景优先使用导出的TensorRT/ONNX模型)
+        self.detector = get_yolo_detector(
             model_path=yolo_path,
-            confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+            confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD,
+            prefer_exported=True
         )
         
         # 加载FaceNet
-        logger.info("加载FaceNet模型...")
-        self.facenet = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
-        logger.info("✓ FaceNet已加载")
+        self.facenet = _get_facenet(self.device)
+        
+        # 复用的FaceNet输入缓冲区 (B, 3, H, W),批量变大时才重新分配
+        self._input_buf = None
         
         # 加载SVM模型
-        logger.info(f"加载SVM模型: {svm_path}")
-        with open(svm_path, 'rb') as f:
-            model_data = pickle.load(f)
+        model_data = _load_svm(svm_path)
         
         # 🔧 修复：兼容新旧格式
         # 新格式：直接保存SVC对象
@@ -88,24 +164,179 @@ class FaceRecognitionTester:
             logger.info(f"  用户列表: {list(self.label_encoder.classes_)}")
         else:
             logger.info(f"  用户列表: {list(self.svm.classes_)}")
+        
+        self._prepare_linear_svm()
+    
+    def _preprocess_into(self, face_image: np.ndarray, out: torch.Tensor):
+        """
+        预处理单张人脸并写入FaceNet输入缓冲区的一行 out (3, H, W)
+        
+        uint8图像上传到设备后再缩放,减少主机端中间缓冲和传输字节数;
+        缩放和归一化在float32下完成,再在写入缓冲区时转换为缓冲区的数据类型(CUDA上为FP16),
+        避免0-255的原始值先截断到FP16再归一化损失精度;BGR->RGB在按通道拷贝时完成
+        """
+        face_tensor = torch.from_numpy(np.ascontiguousarray(face_image))
+        face_tensor = face_tensor.to(self.device, non_blocking=True)
+        
+        # HWC -> CHW视图,调整大小(双线性插值,与cv2.resize默认方式一致)
+        resized = F.interpolate(
+            face_tensor.permute(2, 0, 1).unsqueeze(0).float(),
+            size=config.FACE_SIZE[::-1],
+            mode='bilinear',
+            align_corners=False
+        )[0]
+        # 归一化到[-1, 1]
+        resized.sub_(127.5).div_(128.0)
+        
+        for c in range(3):
+            out[c].copy_(resized[2 - c])
+    
+    def _prepare_linear_svm(self):
+        """
+        CalibratedClassifierCV(LinearSVC): 把各折的决策平面和sigmoid校准参数堆叠成矩阵,
+        预测时一次 (N, 512) x (512, F*C) 矩阵乘法算出所有折的决策值,再向量化完成校准与平均,
+        结果与svm.predict/predict_proba一致
+        
+        其他模型(旧格式SVC等)保持使用svm.predict/predict_proba
+        """
+        self._linear_svm = None
+        
+        folds = getattr(self.svm, 'calibrated_classifiers_', None)
+        if not folds or getattr(self.svm, 'method', None) != 'sigmoid':
+            return
+        
+        num_classes = len(self.svm.classes_)
+        W, b, A, B = [], [], [], []
+        for fold in folds:
+            # sklearn<1.2 中该属性名为base_estimator
+            estimator = getattr(fold, 'estimator', None) or getattr(fold, 'base_estimator', None)
+            if not isinstance(estimator, LinearSVC) or len(estimator.classes_) != num_classes:
+                return
+            W.append(estimator.coef_)
+            b.append(estimator.intercept_)
+            A.append([calibrator.a_ for calibrator in fold.calibrators])
+            B.append([calibrator.b_ for calibrator in fold.calibrators])
+        
+        W = np.asarray(W, dtype=np.float64)  # (F, C, D),二分类时C=1
+        num_folds, num_cols, dim = W.shape
+        self._linear_svm = {
+            'W': W.reshape(num_folds * num_cols, dim).T,  # (D, F*C)
+            'b': np.asarray(b, dtype=np.float64).reshape(-1),
+            'A': np.asarray(A, dtype=np.float64),  # (F, C)
+            'B': np.asarray(B, dtype=np.float64),
+            'shape': (num_folds, num_cols)
+        }
+        logger.info(f"✓ 线性SVM快速预测已启用 ({num_folds} 折校准)")
+    
+    def _predict_linear(self, embeddings: np.ndarray) -> tuple:
+        """
+        校准LinearSVC快速预测
+        
+        Returns:
+            (类别索引 (N,), 概率矩阵 (N, K))
+        """
+        lin = self._linear_svm
+        num_folds, num_cols = lin['shape']
+        num_classes = len(self.svm.classes_)
+        
+        # 所有折的决策值 (N, F, C)
+        decision = embeddings.astype(np.float64, copy=False) @ lin['W'] + lin['b']
+        decision = decision.reshape(len(embeddings), num_folds, num_cols)
+        
+        # sigmoid校准: p = 1 / (1 + exp(A*d + B))
+        proba = expit(-(decision * lin['A'] + lin['B']))
+        
+        if num_classes == 2:
+            proba = np.concatenate([1.0 - proba, proba], axis=2)
+        else:
+            # 各折内按类别归一化,全部为0时取均匀分布
+            denominator = proba.sum(axis=2, keepdims=True)
+            proba = np.divide(
+                proba, denominator,
+                out=np.full_like(proba, 1.0 / num_classes),
+                where=denominator != 0
+            )
+        
+        # 各折概率取平均
+        probabilities = proba.mean(axis=1)
+        return probabilities.argmax(axis=1), probabilities
+    
+    def _get_input_buffer(self, batch_size: int) -> torch.Tensor:
+        """
+        获取设备上的输入缓冲区(前batch_size行)
+        
+        数据类型和内存格式与模型一致(GPU上为FP16 + channels_last),推理前无需再转换
+        """
+        if self._input_buf is None or self._input_buf.shape[0] < batch_size:
+            use_cuda = self.device.type == 'cuda'
+            self._input_buf = torch.empty(
+                (batch_size, 3, *config.FACE_SIZE[::-1]),
+                device=self.device,
+                dtype=torch.float16 if use_cuda else torch.float32,
+                memory_format=torch.channels_last if use_cuda else torch.contiguous_format
+            )
+        return self._input_buf[:batch_size]
+    
+    def extract_embeddings_batch(self, face_images: List[np.ndarray]) -> np.ndarray:
+        """
+        批量提取人脸嵌入向量(一次前向推理)
+        
+        Args:
+            face_images: BGR人脸图像列表
+        
+        Returns:
+            嵌入矩阵 (N, 512)
+        """
+        batch = self._get_input_buffer(len(face_images))
+        for i, face in enumerate(face_images):
+            self._preprocess_into(face, batch[i])
+        
+        # 提取特征
+        with torch.inference_mode():
+            embeddings = self.facenet(batch)
+        
+        # SVM仍接收FP32嵌入
+        return embeddings.float().cpu().numpy()
     
     def extract_embedding(self, face_image: np.ndarray) -> np.ndarray:
         """提取人脸嵌入向量"""
-        # BGR to RGB
-        face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
-        face_resized = cv2.resize(face_rgb, config.FACE_SIZE)
+        return self.extract_embeddings_batch([face_image])[0]
+    
+    def recognize_faces(self, face_images: List[np.ndarray]) -> List[tuple]:
+        """
+        批量识别人脸(FaceNet与SVM均每批只调用一次)
         
-        # 转换为tensor
-        face_tensor = torch.from_numpy(face_resized).float()
-        face_tensor = face_tensor.permute(2, 0, 1)
-        face_tensor = (face_tensor - 127.5) / 128.0
-        face_tensor = face_tensor.unsqueeze(0).to(self.device)
+        Returns:
+            [(用户名/ID, 置信度), ...]
+        """
+        # 提取嵌入
+        embeddings = self.extract_embeddings_batch(face_images)
         
-        # 提取特征
-        with torch.no_grad():
-            embedding = self.facenet(face_tensor)
+        # SVM预测
+        if self._linear_svm is not None:
+            class_indices, probabilities = self._predict_linear(embeddings)
+            predictions = self.svm.classes_[class_indices]
+        else:
+            predictions = self.svm.predict(embeddings)
+            probabilities = self.svm.predict_proba(embeddings)
+            # classes_已排序,可直接二分查找预测类别对应的概率列
+            class_indices = np.searchsorted(self.svm.classes_, predictions)
         
-        return embedding.cpu().numpy().flatten()
+        results = []
+        for prediction, probs, class_idx in zip(predictions, probabilities, class_indices):
+            confidence = probs[class_idx]
+            
+            # 🔧 修复：兼容新旧格式
+            if self.label_encoder:
+                # 旧格式：使用label_encoder解码
+                user_name = self.label_encoder.inverse_transform([prediction])[0]
+            else:
+                # 新格式：prediction直接是用户ID（字符串）
+                user_name = prediction
+            
+            results.append((user_name, confidence))
+        
+        return results
     
     def recognize_face(self, face_image: np.ndarray) -> tuple:
         """
@@ -114,82 +345,143 @@ class FaceRecognitionTester:
         Returns:
             (用户名/ID, 置信度)
         """
-        # 提取嵌入
-        embedding = self.extract_embedding(face_image)
-        
-        # SVM预测
-        prediction = self.svm.predict([embedding])[0]
-        probabilities = self.svm.predict_proba([embedding])[0]
+        return self.recognize_faces([face_image])[0]
+    
+    @staticmethod
+    def _create_tracker(frame: np.ndarray, box: tuple):
+        """
+        为检测框创建轻量级KCF跟踪器
         
-        # 🔧 修复：兼容新旧格式
-        if self.label_encoder:
-            # 旧格式：使用label_encoder解码
-            user_name = self.label_encoder.inverse_transform([prediction])[0]
-            confidence = probabilities[prediction]
-        else:
-            # 新格式：prediction直接是用户ID（字符串）
-            user_name = prediction
-            # 获取对应类别的概率
-            class_idx = list(self.svm.classes_).index(prediction)
-            confidence = probabilities[class_idx]
+        Returns:
+            跟踪器对象,当前OpenCV不含KCF(需opencv-contrib)时返回None
+        """
+        factory = getattr(cv2, 'TrackerKCF_create', None)
+        if factory is None and hasattr(cv2, 'legacy'):
+            factory = getattr(cv2.legacy, 'TrackerKCF_create', None)
+        if factory is None:
+            return None
         
-        return user_name, confidence
+        x1, y1, x2, y2 = box
+        tracker = factory()
+        tracker.init(frame, (x1, y1, x2 - x1, y2 - y1))
+        return tracker
     
-    def test_realtime(self, camera_index: int = 0, confidence_threshold: float = 0.5):
-        """实时测试"""
+    def test_realtime(
+        self,
+        camera_index: int = 0,
+        confidence_threshold: float = 0.5,
+        detect_interval: int = 3,
+        headless: bool = False
+    ):
+        """
+        实时测试
+        
+        Args:
+            camera_index: 摄像头索引
+            confidence_threshold: 识别置信度阈值
+            detect_interval: 每隔多少帧运行一次YOLO+FaceNet,
+                中间帧由跟踪器更新人脸框并沿用上次识别结果
+            headless: 无界面模式,识别结果输出到日志,按Ctrl+C结束
+        """
         logger.info("\n" + "=" * 60)
         logger.info("FaceNet 人脸识别实时测试")
         logger.info("=" * 60)
-        logger.info("按 'q' 退出\n")
+        logger.info("按 'q' 退出(无界面模式按 Ctrl+C)\n")
+        
+        # 无界面模式下由SIGINT触发退出
+        stop_event = create_stop_event() if headless else None
+        last_names = None
         
-        cap = cv2.VideoCapture(camera_index)
+        # 后台线程读取摄像头帧,与检测识别并行
+        cap = VideoStream(camera_index)
         if not cap.isOpened():
             logger.error(f"无法打开摄像头 {camera_index}")
+            cap.release()
+            if stop_event is not None:
+                stop_event.stop()
             return
+        cap.start()
+        
+        frame_idx = 0
+        # 当前跟踪的人脸: [{'tracker', 'box', 'user_name', 'confidence'}, ...]
+        tracked_faces = []
         
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
             
-            # 检测人脸
-            face = self.detector.detect_single_face(frame, margin=20)
+            if frame_idx % detect_interval == 0:
+                # 检测人脸(一次推理同时得到边界框和裁剪结果)
+                boxes, crops = self.detector.detect_faces_and_crops(
+                    frame, margin=20, max_size=DETECT_MAX_SIZE
+                )
+                
+                tracked_faces = []
+                if crops:
+                    # 同一帧内的所有人脸一次批量识别
+                    try:
+                        results = self.recognize_faces(crops)
+                        
+                        for box, (user_name, confidence) in zip(boxes, results):
+                            tracked_faces.append({
+                                'tracker': self._create_tracker(frame, box),
+                                'box': box,
+                                'user_name': user_name,
+                                'confidence': confidence
+                            })
+                    
+                    except Exception as e:
+                        logger.error(f"识别失败: {e}")
+            else:
+                # 中间帧: 仅用跟踪器更新人脸框
+                for face in tracked_faces:
+                    if face['tracker'] is None:
+                        continue
+                    ok, (x, y, w, h) = face['tracker'].update(frame)
+                    if ok:
+                        face['box'] = (int(x), int(y), int(x + w), int(y + h))
+            
+            frame_idx += 1
+            
+            # 无界面模式: 识别结果变化时输出日志,跳过绘制和显示
+            if headless:
+                names = tuple(face['user_name'] for face in tracked_faces)
+                if names != last_names:
+                    logger.info(f"识别结果: {list(names) if names else '未检测到人脸'}")
+                    last_names = names
+                if stop_event.is_set():
+                    break
+                continue
             
             # 显示画面
             display_frame = frame.copy()
             
-            if face is not None:
-                # 识别
-                try:
-                    user_name, confidence = self.recognize_face(face)
-                    
-                    # 绘制结果
-                    boxes = self.detector.detect_faces(frame)
-                    if boxes:
-                        x1, y1, x2, y2 = boxes[0]
-                        
-                        # 根据置信度选择颜色
-                        if confidence >= confidence_threshold:
-                            color = (0, 255, 0)  # 绿色 - 识别成功
-                            text = f"{user_name} ({confidence:.2f})"
-                        else:
-                            color = (0, 165, 255)  # 橙色 - 置信度低
-                            text = f"Unknown ({confidence:.2f})"
-                        
-                        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(
-                            display_frame,
-                            text,
-                            (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.7,
-                            color,
-                            2
-                        )
-                    
-                except Exception as e:
-                    logger.error(f"识别失败: {e}")
-            else:
+            for face in tracked_faces:
+                x1, y1, x2, y2 = face['box']
+                user_name = face['user_name']
+                confidence = face['confidence']
+                
+                # 根据置信度选择颜色
+                if confidence >= confidence_threshold:
+                    color = (0, 255, 0)  # 绿色 - 识别成功
+                    text = f"{user_name} ({confidence:.2f})"
+                else:
+                    color = (0, 165, 255)  # 橙色 - 置信度低
+                    text = f"Unknown ({confidence:.2f})"
+                
+                cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(
+                    display_frame,
+                    text,
+                    (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7,
+                    color,
+                    2
+                )
+            
+            if not tracked_faces:
                 # 未检测到人脸
                 cv2.putText(
                     display_frame,
@@ -207,13 +499,30 @@ class FaceRecognitionTester:
                 break
         
         cap.release()
-        cv2.destroyAllWindows()
+        if headless:
+            stop_event.stop()
+        else:
+            cv2.destroyAllWindows()
 
 
 def main():
     """测试入口"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='FaceNet人脸识别实时测试')
+    parser.add_argument('--camera', type=int, default=0,
+                        help='摄像头索引')
+    parser.add_argument('--headless', action='store_true',
+                        help='无界面模式(不显示画面)')
+    
+    args = parser.parse_args()
+    
     tester = FaceRecognitionTester()
-    tester.test_realtime(confidence_threshold=0.6)
+    tester.test_realtime(
+        camera_index=args.camera,
+        confidence_threshold=0.6,
+        headless=args.headless
+    )
 
 
 if __name__ == '__main__':
@@ -3,16 +3,25 @@ FaceNet人脸识别训练脚本
 使用facenet-pytorch提取人脸特征,训练SVM分类器
 """
 import cv2  # 先导入cv2避免DLL问题
+import hashlib
 import numpy as np
+import os
 import pickle
 import sys
+import multiprocessing
+from contextlib import nullcontext
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 # 添加backend目录到路径
 backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sklearn.svm import SVC
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
@@ -20,7 +29,7 @@ import torch
 from facenet_pytorch import InceptionResnetV1
 import mediapipe as mp
 from config import config
-from train.common import YOLOFaceDetector, load_dataset_by_class
+from train.common import YOLOFaceDetector, load_dataset_by_class, list_image_files
 import logging
 
 # 配置日志
@@ -31,40 +40,44 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class FaceNetTrainer:
-    """FaceNet人脸识别训练器"""
+class FacePreprocessor:
+    """
+    人脸预处理器: YOLO检测 + MediaPipe对齐 + 数据增强
+    
+    不依赖FaceNet模型,可在数据加载子进程中独立创建
+    """
+    
+    # 数据增强的旋转角度
+    AUGMENT_ANGLES = (-5, 5)
+    
+    # 眼睛连线倾角小于该值(度)时跳过旋转对齐
+    MIN_ALIGN_ANGLE = 2.0
+    # FaceMesh关键点检测的输入尺寸
+    MESH_INPUT_SIZE = 96
+    
+    # 对齐/增强逻辑版本号,修改相应处理后递增,使嵌入缓存中的旧结果失效
+    ALIGN_VERSION = 2
+    AUGMENT_VERSION = 1
     
     def __init__(
         self,
-        dataset_dir: str = "dataset",
-        yolo_model_path: str = None,
-        device: str = None
+        yolo_model_path: str,
+        confidence_threshold: float = 0.5,
+        device: Optional[str] = None
     ):
         """
-        初始化训练器
+        初始化预处理器
         
         Args:
-            dataset_dir: 数据集目录
             yolo_model_path: YOLO模型路径
-            device: 设备
+            confidence_threshold: YOLO检测置信度阈值
+            device: YOLO推理设备,None则自动选择
         """
-        self.dataset_dir = Path(dataset_dir)
-        
-        # 设置设备
-        if device is None:
-            self.device = config.get_device()
-        else:
-            self.device = torch.device(device)
-        
-        logger.info(f"使用设备: {self.device}")
-        
         # 初始化YOLO检测器
-        if yolo_model_path is None:
-            yolo_model_path = str(config.YOLO_MODEL)
-        
         self.detector = YOLOFaceDetector(
             model_path=yolo_model_path,
-            confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+            confidence_threshold=confidence_threshold,
+            device=device
         )
         
         # 初始化MediaPipe人脸关键点检测(用于对齐)
@@ -77,39 +90,71 @@ class FaceNetTrainer:
         )
         logger.info("✓ MediaPipe模型已加载")
         
-        # 初始化FaceNet模型(使用预训练权重)
-        logger.info("加载FaceNet模型...")
-        self.facenet = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
-        logger.info("✓ FaceNet模型已加载")
+        # 预计算数据增强用的旋转映射表(所有图像复用)
+        self._rotation_maps = [
+            self._build_rotation_maps(angle, config.FACE_SIZE)
+            for angle in self.AUGMENT_ANGLES
+        ]
+    
+    @staticmethod
+    def _build_rotation_maps(angle: float, size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        生成绕图像中心旋转的remap映射表(与warpAffine结果一致)
         
-        self.X = []  # 特征向量
-        self.y = []  # 标签
-        self.label_encoder = LabelEncoder()
-        self.svm_model = None
+        Args:
+            angle: 旋转角度(度)
+            size: 图像尺寸 (width, height)
+        
+        Returns:
+            cv2.remap使用的定点映射表 (map1, map2)
+        """
+        w, h = size
+        M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
+        # warpAffine按逆变换从目标像素回查源像素
+        M_inv = cv2.invertAffineTransform(M)
+        xs, ys = np.meshgrid(
+            np.arange(w, dtype=np.float32),
+            np.arange(h, dtype=np.float32)
+        )
+        map_x = (M_inv[0, 0] * xs + M_inv[0, 1] * ys + M_inv[0, 2]).astype(np.float32)
+        map_y = (M_inv[1, 0] * xs + M_inv[1, 1] * ys + M_inv[1, 2]).astype(np.float32)
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
     
     def align_face(self, face_image: np.ndarray) -> np.ndarray:
         """
         使用MediaPipe进行人脸对齐
         
+        旋转与缩放合成为一个仿射矩阵,一次warpAffine直接输出FaceNet输入尺寸
+        
         Args:
             face_image: BGR格式人脸图像
         
         Returns:
-            对齐后的人脸图像
+            对齐后的160x160 RGB人脸图像
         """
+        # 转RGB(FaceMesh与FaceNet均使用RGB,只转换一次)
+        face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
+        
+        h, w = face_image.shape[:2]
+        
         try:
-            # 转RGB
-            face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
-            
-            # 检测关键点
-            results = self.mp_face_mesh.process(face_rgb)
+            # 检测关键点: FaceMesh耗时随图像尺寸增长,在缩小图上检测即可
+            # (关键点为归一化坐标,可直接换算回原图)
+            mesh_input = face_rgb
+            if max(h, w) > self.MESH_INPUT_SIZE:
+                mesh_input = cv2.resize(
+                    face_rgb,
+                    (self.MESH_INPUT_SIZE, self.MESH_INPUT_SIZE),
+                    interpolation=cv2.INTER_AREA
+                )
+            results = self.mp_face_mesh.process(mesh_input)
             
             if not results.multi_face_landmarks:
-                return face_image  # 未检测到关键点,返回原图
+                # 未检测到关键点,直接缩放原图
+                return cv2.resize(face_rgb, config.FACE_SIZE)
             
             # 获取关键点
             landmarks = results.multi_face_landmarks[0]
-            h, w = face_image.shape[:2]
             
             # 提取眼睛关键点(用于对齐)
             # 左眼: 33, 右眼: 263
@@ -125,15 +170,22 @@ class FaceNetTrainer:
             dX = right_eye_pt[0] - left_eye_pt[0]
             angle = np.degrees(np.arctan2(dY, dX))
             
+            # 基本正脸时无需旋转,直接缩放
+            if abs(angle) < self.MIN_ALIGN_ANGLE:
+                return cv2.resize(face_rgb, config.FACE_SIZE)
+            
             # 计算眼睛中心
             eyes_center = ((left_eye_pt[0] + right_eye_pt[0]) / 2,
                           (left_eye_pt[1] + right_eye_pt[1]) / 2)
             
-            # 获取旋转矩阵
+            # 获取旋转矩阵,并左乘缩放矩阵映射到输出尺寸
             M = cv2.getRotationMatrix2D(eyes_center, angle, 1.0)
+            out_w, out_h = config.FACE_SIZE
+            M[0] *= out_w / w
+            M[1] *= out_h / h
             
-            # 旋转图像
-            aligned = cv2.warpAffine(face_image, M, (w, h),
+            # 旋转并缩放图像
+            aligned = cv2.warpAffine(face_rgb, M, (out_w, out_h),
                                     flags=cv2.INTER_CUBIC,
                                     borderMode=cv2.BORDER_REPLICATE)
             
@@ -141,79 +193,506 @@ class FaceNetTrainer:
             
         except Exception as e:
             logger.debug(f"人脸对齐失败: {e}, 使用原图")
-            return face_image
+            return cv2.resize(face_rgb, config.FACE_SIZE)
     
-    def extract_face_embedding(self, face_image: np.ndarray, use_alignment: bool = True) -> np.ndarray:
+    def augment_face(self, face_image: np.ndarray) -> list:
         """
-        提取人脸嵌入向量
+        数据增强:生成轻微变换的人脸图像
         
         Args:
-            face_image: BGR格式人脸图像
-            use_alignment: 是否使用MediaPipe对齐
+            face_image: 对齐后的RGB人脸图像
         
         Returns:
-            512维嵌入向量
+            增强后的人脸图像列表
         """
-        # 1. 人脸对齐
-        if use_alignment:
-            face_image = self.align_face(face_image)
+        augmented = [face_image]  # 包含原图
         
-        # 2. BGR to RGB
-        face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
+        h, w = face_image.shape[:2]
+        
+        # 轻微旋转 (-5, +5度)
+        if (w, h) == config.FACE_SIZE:
+            # 对齐后的人脸尺寸固定,直接使用预计算的映射表
+            for map1, map2 in self._rotation_maps:
+                augmented.append(cv2.remap(face_image, map1, map2, cv2.INTER_LINEAR))
+        else:
+            for angle in self.AUGMENT_ANGLES:
+                M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
+                augmented.append(cv2.warpAffine(face_image, M, (w, h)))
+        
+        # 亮度调整(uint8饱和运算直接缩放像素值,无需HSV往返转换)
+        augmented.append(cv2.convertScaleAbs(face_image, alpha=1.1, beta=0))  # 增亮10%
+        augmented.append(cv2.convertScaleAbs(face_image, alpha=0.9, beta=0))  # 降暗10%
+        
+        return augmented
+    
+    @classmethod
+    def cache_key(cls, img_data: np.ndarray, model_tag: str = '') -> str:
+        """
+        计算图像的嵌入缓存键: 文件内容哈希 + 对齐/增强版本号 + 模型指纹
+        
+        Args:
+            img_data: 图像文件原始字节
+            model_tag: 检测/嵌入模型指纹(见FaceNetTrainer._embedding_cache_tag)
+        """
+        digest = hashlib.sha1(img_data).hexdigest()[:16]
+        return f"{digest}_a{cls.ALIGN_VERSION}_g{cls.AUGMENT_VERSION}_m{model_tag}"
+    
+    @classmethod
+    def _read_image_file(
+        cls,
+        img_path: Path,
+        model_tag: str = ''
+    ) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """读取图像字节(支持中文路径)并计算缓存键,失败返回(None, None)"""
+        try:
+            img_data = np.fromfile(str(img_path), dtype=np.uint8)
+            return img_data, cls.cache_key(img_data, model_tag)
+        except Exception as e:
+            logger.warning(f"  ⚠ 读取图像失败 {img_path}: {e}")
+            return None, None
+    
+    def process_user_images(
+        self,
+        user_dir: Path,
+        cached_keys: FrozenSet[str] = frozenset(),
+        model_tag: str = '',
+        max_io_workers: int = 8
+    ) -> Tuple[List[Tuple[str, Optional[List[np.ndarray]]]], int]:
+        """
+        加载一个用户目录的图像,完成检测、对齐和数据增强
+        
+        Args:
+            user_dir: 用户图像目录
+            cached_keys: 嵌入缓存中已有的键,命中的图像跳过解码和预处理
+            model_tag: 缓存键中的模型指纹
+            max_io_workers: 读取/哈希/解码线程数(均释放GIL)
+        
+        Returns:
+            ([(缓存键, 160x160 RGB uint8人脸图像列表), ...], 原始图像数);
+            命中缓存的图像人脸列表为None
+        """
+        image_paths = list_image_files(user_dir)
+        
+        # 先并行读取文件并按内容哈希查缓存,再只对未命中的图像并行解码
+        with ThreadPoolExecutor(max_workers=max_io_workers) as executor:
+            files = list(executor.map(
+                lambda path: self._read_image_file(path, model_tag),
+                image_paths
+            ))
+            miss_indices = [
+                i for i, (img_data, key) in enumerate(files)
+                if img_data is not None and key not in cached_keys
+            ]
+            decoded = dict(zip(miss_indices, executor.map(
+                lambda i: cv2.imdecode(files[i][0], cv2.IMREAD_COLOR),
+                miss_indices
+            )))
+        
+        # 预处理每张图像(带数据增强)
+        results = []
+        for i, (img_data, key) in enumerate(files):
+            if img_data is None:
+                continue
+            
+            if key in cached_keys:
+                results.append((key, None))
+                continue
+            
+            try:
+                img = decoded[i]
+                if img is None:
+                    logger.warning(f"  ⚠ 无法读取图像: {image_paths[i]}")
+                    continue
+                
+                # 检测人脸
+                face = self.detector.detect_single_face(img)
+                
+                if face is None:
+                    logger.warning(f"  ⚠ {user_dir.name} 图像 {i+1} 未检测到人脸,跳过")
+                    # 同样记入缓存,下次无需重复检测
+                    results.append((key, []))
+                    continue
+                
+                # 每张人脸只对齐一次(输出160x160 RGB)
+                aligned = self.align_face(face)
+                
+                # 在对齐结果上做数据增强(每张原图生成多个变体)
+                results.append((key, self.augment_face(aligned)))
+                
+            except Exception as e:
+                logger.warning(f"  ⚠ {user_dir.name} 处理图像 {i+1} 失败: {e}")
+        
+        return results, len(image_paths)
+
+
+# 数据加载子进程中的预处理器(由进程池initializer创建,每个进程只加载一次模型)
+_worker_preprocessor = None
+_worker_cached_keys = frozenset()
+_worker_model_tag = ''
+
+
+def _init_preprocess_worker(
+    yolo_model_path: str,
+    confidence_threshold: float,
+    device: str,
+    cached_keys: FrozenSet[str],
+    model_tag: str
+):
+    """进程池初始化: 在子进程中创建预处理器"""
+    global _worker_preprocessor, _worker_cached_keys, _worker_model_tag
+    # 进程数已与CPU核数相当,每个进程内的torch/OpenCV只用单线程,避免线程数成倍超额
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+    _worker_preprocessor = FacePreprocessor(yolo_model_path, confidence_threshold, device)
+    _worker_cached_keys = cached_keys
+    _worker_model_tag = model_tag
+
+
+def _preprocess_user_worker(user_dir: Path):
+    """子进程任务: 预处理一个用户目录"""
+    return _worker_preprocessor.process_user_images(
+        user_dir, _worker_cached_keys, _worker_model_tag, max_io_workers=2
+    )
+
+
+class FaceNetTrainer:
+    """FaceNet人脸识别训练器"""
+    
+    # FaceNet嵌入向量维度
+    EMBEDDING_DIM = 512
+    # 批量提取嵌入向量时每次前向推理的批大小
+    BATCH_SIZE = 64
+    # CUDA可用且用户数不超过该值时,默认在主进程中用GPU YOLO预处理,不启动进程池
+    GPU_INPROCESS_MAX_USERS = 16
+    
+    def __init__(
+        self,
+        dataset_dir: str = "dataset",
+        yolo_model_path: str = None,
+        device: str = None
+    ):
+        """
+        初始化训练器
+        
+        Args:
+            dataset_dir: 数据集目录
+            yolo_model_path: YOLO模型路径
+            device: 设备
+        """
+        self.dataset_dir = Path(dataset_dir)
         
-        # 3. 调整大小到160x160
-        face_resized = cv2.resize(face_rgb, config.FACE_SIZE)
+        # 设置设备
+        if device is None:
+            self.device = config.get_device()
+        else:
+            self.device = torch.device(device)
         
-        # 4. 转换为tensor并归一化
-        face_tensor = torch.from_numpy(face_resized).float()
-        face_tensor = face_tensor.permute(2, 0, 1)  # HWC -> CHW
-        face_tensor = (face_tensor - 127.5) / 128.0  # 归一化到[-1, 1]
-        face_tensor = face_tensor.unsqueeze(0).to(self.device)  # 添加batch维度
+        logger.info(f"使用设备: {self.device}")
         
-        # 5. 提取特征
-        with torch.no_grad():
-            embedding = self.facenet(face_tensor)
+        # 人脸预处理器(YOLO检测 + MediaPipe对齐)在首次使用时创建,
+        # 多进程预处理时主进程无需加载这些模型
+        if yolo_model_path is None:
+            yolo_model_path = str(config.YOLO_MODEL)
         
-        # 6. 转换为numpy
-        embedding = embedding.cpu().numpy().flatten()
+        self.yolo_model_path = yolo_model_path
+        self._preprocessor = None
         
-        return embedding
+        # 初始化FaceNet模型(使用预训练权重)
+        logger.info("加载FaceNet模型...")
+        self.facenet = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
+        
+        # 常驻输入缓冲区,避免每批重新分配:
+        # 锁页uint8暂存区(NHWC) -> 设备端uint8缓冲区 -> 设备端float输入(NCHW)
+        # 主机到设备只传输uint8,字节数为float32的1/4,类型转换和归一化在设备上完成
+        face_w, face_h = config.FACE_SIZE
+        use_cuda = self.device.type == 'cuda'
+        self._host_buf = torch.empty(
+            (self.BATCH_SIZE, face_h, face_w, 3), dtype=torch.uint8, pin_memory=use_cuda
+        )
+        self._dev_buf = (
+            torch.empty_like(self._host_buf, device=self.device)
+            if use_cuda else self._host_buf
+        )
+        self._dev_input = torch.empty(
+            (self.BATCH_SIZE, 3, face_h, face_w), dtype=torch.float32, device=self.device
+        )
+        
+        # 推理入口: 编译/trace后的FaceNet(self.facenet保留原始eager模块)
+        self._embed, self._static_batch = self._optimize_facenet(self.facenet)
+        logger.info("✓ FaceNet模型已加载")
+        
+        self.X = []  # 特征向量
+        self.y = []  # 标签
+        self.label_encoder = LabelEncoder()
+        self.svm_model = None
+    
+    @property
+    def preprocessor(self) -> FacePreprocessor:
+        """主进程中的人脸预处理器(首次访问时加载YOLO和MediaPipe模型)"""
+        if self._preprocessor is None:
+            self._preprocessor = FacePreprocessor(
+                yolo_model_path=self.yolo_model_path,
+                confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+            )
+        return self._preprocessor
+    
+    @property
+    def detector(self) -> YOLOFaceDetector:
+        """YOLO人脸检测器"""
+        return self.preprocessor.detector
+    
+    def _optimize_facenet(self, facenet: torch.nn.Module) -> Tuple[torch.nn.Module, bool]:
+        """
+        编译FaceNet并预热
+        
+        优先使用torch.compile(reduce-overhead,CUDA下使用CUDA Graph),
+        失败时退回TorchScript trace,均失败则保持eager模式
+        
+        Args:
+            facenet: eval模式的FaceNet模型
+        
+        Returns:
+            (推理模块, 是否需要固定满批输入)
+        """
+        if self.device.type == 'cuda':
+            # 输入尺寸固定,让cuDNN为每层选择最快的卷积算法
+            torch.backends.cudnn.benchmark = True
+        
+        # 推理时ReLU可原地计算,减少中间张量
+        for module in facenet.modules():
+            if isinstance(module, torch.nn.ReLU):
+                module.inplace = True
+        
+        # 以满批的设备输入缓冲区作为编译/trace和预热输入
+        dummy = self._dev_input.normal_()
+        
+        if hasattr(torch, 'compile'):
+            try:
+                compiled = torch.compile(facenet, mode='reduce-overhead', fullgraph=True)
+                # 预热两次: 第一次编译,第二次录制CUDA Graph
+                with torch.inference_mode(), self._autocast():
+                    for _ in range(2):
+                        compiled(dummy)
+                logger.info("✓ FaceNet已通过torch.compile编译")
+                # CUDA Graph回放要求输入形状和地址固定,CUDA下始终以同一满批缓冲区调用;
+                # CPU下没有CUDA Graph,按实际行数推理,避免尾批和单张人脸也计算满批
+                return compiled, self.device.type == 'cuda'
+            except Exception as e:
+                logger.warning(f"torch.compile不可用,尝试TorchScript: {e}")
+        
+        try:
+            # 在autocast下trace,使混合精度的类型转换直接记录进图中
+            if hasattr(torch._C, '_jit_set_autocast_mode'):
+                torch._C._jit_set_autocast_mode(False)
+            with torch.no_grad(), self._autocast():
+                traced = torch.jit.trace(facenet, dummy)
+                traced = torch.jit.optimize_for_inference(traced)
+                # 预热两次,触发图优化和cuDNN算法选择
+                for _ in range(2):
+                    traced(dummy)
+            logger.info("✓ FaceNet已通过TorchScript优化")
+            return traced, False
+        except Exception as e:
+            logger.warning(f"TorchScript优化失败,使用eager模式: {e}")
+            return facenet, False
+    
+    def _autocast(self):
+        """
+        FaceNet前向推理的混合精度上下文: GPU使用FP16,CPU保持FP32
+        
+        CPU不一定原生支持BF16(无AVX512-BF16/AMX时反而更慢),且识别端
+        (models/facenet_recognizer.py)在CPU上计算FP32嵌入,训练嵌入需与之一致
+        """
+        if self.device.type == 'cuda':
+            return torch.autocast(device_type='cuda', dtype=torch.float16)
+        return nullcontext()
+    
+    def align_face(self, face_image: np.ndarray) -> np.ndarray:
+        """使用MediaPipe进行人脸对齐(见FacePreprocessor.align_face)"""
+        return self.preprocessor.align_face(face_image)
     
     def augment_face(self, face_image: np.ndarray) -> list:
+        """数据增强(见FacePreprocessor.augment_face)"""
+        return self.preprocessor.augment_face(face_image)
+    
+    def prepare_face(self, face_image: np.ndarray, use_alignment: bool = True) -> np.ndarray:
         """
-        数据增强:生成轻微变换的人脸图像
+        预处理人脸为FaceNet输入图像
         
         Args:
-            face_image: 原始人脸图像
+            face_image: BGR格式人脸图像
+            use_alignment: 是否使用MediaPipe对齐
         
         Returns:
-            增强后的人脸图像列表
+            160x160 RGB uint8图像
         """
-        augmented = [face_image]  # 包含原图
+        # 对齐时已直接输出160x160 RGB图像
+        if use_alignment:
+            return self.align_face(face_image)
         
-        h, w = face_image.shape[:2]
+        # BGR to RGB, 调整大小到160x160
+        face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
+        return cv2.resize(face_rgb, config.FACE_SIZE)
+    
+    def extract_embeddings_batch(
+        self,
+        faces_rgb: list,
+        out: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        批量提取人脸嵌入向量
         
-        # 轻微旋转 (-5, +5度)
-        for angle in [-5, 5]:
-            M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
-            rotated = cv2.warpAffine(face_image, M, (w, h))
-            augmented.append(rotated)
-        
-        # 亮度调整
-        hsv = cv2.cvtColor(face_image, cv2.COLOR_BGR2HSV).astype(np.float32)
-        hsv[:, :, 2] = hsv[:, :, 2] * 1.1  # 增亮10%
-        hsv[:, :, 2] = np.clip(hsv[:, :, 2], 0, 255)
-        brightened = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-        augmented.append(brightened)
-        
-        hsv[:, :, 2] = hsv[:, :, 2] * 0.9  # 降暗10%
-        darkened = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-        augmented.append(darkened)
+        Args:
+            faces_rgb: prepare_face输出的160x160 RGB uint8图像列表
+            out: 可选的预分配输出数组 (N, 512) float32,结果直接写入其中
         
-        return augmented
+        Returns:
+            嵌入矩阵 (N, 512) float32
+        """
+        if out is None:
+            out = np.empty((len(faces_rgb), self.EMBEDDING_DIM), dtype=np.float32)
+        
+        # 归一化在FP32下完成,GPU上前向推理使用FP16;嵌入向量已L2归一化,精度损失可忽略
+        with torch.inference_mode(), self._autocast():
+            for start in range(0, len(faces_rgb), self.BATCH_SIZE):
+                chunk = faces_rgb[start:start + self.BATCH_SIZE]
+                n = len(chunk)
+                
+                # uint8图像直接堆叠进锁页暂存区
+                host = self._host_buf[:n]
+                np.stack(chunk, out=host.numpy())
+                
+                # 异步拷贝到设备缓冲区(CPU模式下两者为同一块内存)
+                dev = self._dev_buf[:n]
+                if dev.data_ptr() != host.data_ptr():
+                    dev.copy_(host, non_blocking=True)
+                
+                # 在设备上转换布局(NHWC -> NCHW)、转float并归一化到[-1, 1]
+                batch = self._dev_input[:n]
+                batch.copy_(dev.permute(0, 3, 1, 2))
+                batch.sub_(127.5).mul_(1.0 / 128.0)
+                
+                # CUDA Graph模式下始终输入完整缓冲区(形状和地址固定),只取前n行结果
+                if self._static_batch:
+                    embeddings = self._embed(self._dev_input)[:n]
+                else:
+                    embeddings = self._embed(batch)
+                
+                # .cpu()会同步,保证下一批写入暂存区前本批拷贝已完成
+                out[start:start + n] = embeddings.float().cpu().numpy()
+        
+        return out
+    
+    def extract_face_embedding(self, face_image: np.ndarray, use_alignment: bool = True) -> np.ndarray:
+        """
+        提取人脸嵌入向量
+        
+        Args:
+            face_image: BGR格式人脸图像
+            use_alignment: 是否使用MediaPipe对齐
+        
+        Returns:
+            512维嵌入向量
+        """
+        face_rgb = self.prepare_face(face_image, use_alignment=use_alignment)
+        return self.extract_embeddings_batch([face_rgb])[0]
+    
+    def _iter_preprocessed_users(
+        self,
+        user_dirs: List[Path],
+        num_workers: int,
+        cached_keys: FrozenSet[str],
+        model_tag: str
+    ):
+        """
+        按用户顺序产出预处理结果
+        
+        num_workers > 1 时使用进程池并行完成读图、检测、对齐和增强,
+        每个子进程只加载一次YOLO和MediaPipe模型
+        """
+        if num_workers <= 1:
+            for user_dir in user_dirs:
+                yield self.preprocessor.process_user_images(user_dir, cached_keys, model_tag)
+            return
+        
+        logger.info(f"使用 {num_workers} 个进程并行预处理")
+        # spawn避免子进程继承主进程已初始化的CUDA上下文;
+        # 子进程中的YOLO固定使用CPU,否则每个进程都会创建自己的CUDA上下文和模型副本,显存很快耗尽
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_preprocess_worker,
+            initargs=(
+                self.yolo_model_path,
+                config.YOLO_CONFIDENCE_THRESHOLD,
+                'cpu',
+                cached_keys,
+                model_tag
+            )
+        ) as executor:
+            # 最多提前提交2倍进程数的任务,主进程提取嵌入较慢时已完成的结果不会无限堆积
+            remaining = iter(user_dirs)
+            pending = deque(
+                executor.submit(_preprocess_user_worker, user_dir)
+                for user_dir in islice(remaining, 2 * num_workers)
+            )
+            while pending:
+                result = pending.popleft().result()
+                next_dir = next(remaining, None)
+                if next_dir is not None:
+                    pending.append(executor.submit(_preprocess_user_worker, next_dir))
+                yield result
+    
+    def _embedding_cache_tag(self) -> str:
+        """
+        嵌入缓存的模型指纹: YOLO权重内容、检测置信度阈值和FaceNet推理精度
+        
+        任一变化时旧缓存条目(包括"未检测到人脸"的记录)全部失效
+        """
+        h = hashlib.sha1()
+        try:
+            with open(self.yolo_model_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+        except OSError:
+            h.update(str(self.yolo_model_path).encode('utf-8'))
+        precision = 'fp16' if self.device.type == 'cuda' else 'fp32'
+        h.update(f"|{config.YOLO_CONFIDENCE_THRESHOLD}|{precision}".encode('utf-8'))
+        return h.hexdigest()[:8]
     
-    def load_and_process_dataset(self):
-        """加载并处理数据集"""
+    def _load_embedding_cache(self) -> Dict[str, np.ndarray]:
+        """加载嵌入向量缓存 {缓存键: 该图像所有增强样本的嵌入 (k, 512)}"""
+        cache_path = config.FACENET_EMB_CACHE
+        if not cache_path.exists():
+            return {}
+        
+        try:
+            with np.load(cache_path) as data:
+                cache = {key: data[key] for key in data.files}
+            logger.info(f"✓ 已加载嵌入缓存: {len(cache)} 张图像")
+            return cache
+        except Exception as e:
+            logger.warning(f"嵌入缓存加载失败,将重新计算: {e}")
+            return {}
+    
+    def _save_embedding_cache(self, cache: Dict[str, np.ndarray]):
+        """保存嵌入向量缓存"""
+        cache_path = config.FACENET_EMB_CACHE
+        try:
+            np.savez(cache_path, **cache)
+            logger.info(f"✓ 嵌入缓存已保存: {cache_path} ({len(cache)} 张图像)")
+        except Exception as e:
+            logger.warning(f"嵌入缓存保存失败: {e}")
+    
+    def load_and_process_dataset(self, num_workers: int = None, use_cache: bool = True):
+        """
+        加载并处理数据集
+        
+        Args:
+            num_workers: 预处理进程数,None则自动选择(CUDA下用户较少时为1,否则为CPU核数且不超过用户数),
+                1则在主进程中处理
+            use_cache: 是否使用嵌入缓存(内容未变化的图像跳过检测和FaceNet推理)
+        """
         logger.info("=" * 60)
         logger.info("加载数据集...")
         logger.info("=" * 60)
@@ -231,8 +710,27 @@ class FaceNetTrainer:
         
         logger.info(f"找到 {len(user_dirs)} 个用户")
         
-        # 处理每个用户
-        for user_dir in user_dirs:
+        if num_workers is None:
+            if self.device.type == 'cuda' and len(user_dirs) <= self.GPU_INPROCESS_MAX_USERS:
+                # 用户较少时GPU YOLO单进程更快,也省去子进程加载模型的开销
+                num_workers = 1
+            else:
+                num_workers = min(os.cpu_count() or 1, len(user_dirs))
+        
+        cache = self._load_embedding_cache() if use_cache else {}
+        cached_keys = frozenset(cache)
+        model_tag = self._embedding_cache_tag()
+        
+        # 每个用户预处理完成后立即提取嵌入,增强后的人脸图像不在内存中累积;
+        # 各用户的float32嵌入块最后一次性拼接(GPU上的FaceNet推理始终在主进程中批量进行)
+        emb_chunks = []
+        label_chunks = []
+        new_cache = {}  # 只保留本次用到的条目,已删除图像的缓存随之清除
+        num_computed = 0
+        preprocessed = self._iter_preprocessed_users(
+            user_dirs, num_workers, cached_keys, model_tag
+        )
+        for user_dir, (results, num_images) in zip(user_dirs, preprocessed):
             user_folder_name = user_dir.name
             
             # 🔧 关键修改：尝试将文件夹名转换为数字ID
@@ -247,48 +745,81 @@ class FaceNetTrainer:
                 logger.warning(f"\n处理用户: {user_folder_name} (字符串用户名 - 不推荐)")
                 logger.warning(f"  ⚠️  建议使用数字作为文件夹名，例如: 1, 2, 3...")
             
-            # 直接加载该用户目录下的所有图像
-            from train.common.data_utils import load_face_images
-            images = load_face_images(user_dir)
-            
-            if len(images) == 0:
+            if num_images == 0:
                 logger.warning(f"  ⚠ 用户 {user_label} 没有图像,跳过")
                 continue
             
-            # 提取每张图像的嵌入向量(带数据增强)
-            embeddings = []
-            for i, img in enumerate(images):
-                try:
-                    # 检测人脸
-                    face = self.detector.detect_single_face(img)
-                    
-                    if face is None:
-                        logger.warning(f"  ⚠ 图像 {i+1} 未检测到人脸,跳过")
-                        continue
-                    
-                    # 数据增强(每张原图生成多个变体)
-                    augmented_faces = self.augment_face(face)
-                    
-                    # 对每个增强样本提取特征(使用MTCNN对齐)
-                    for aug_face in augmented_faces:
-                        embedding = self.extract_face_embedding(aug_face, use_alignment=True)
-                        embeddings.append(embedding)
-                    
-                except Exception as e:
-                    logger.warning(f"  ⚠ 处理图像 {i+1} 失败: {e}")
+            num_faces = sum(
+                len(cache[key]) if faces is None else len(faces)
+                for key, faces in results
+            )
+            num_hits = sum(1 for _, faces in results if faces is None)
             
-            if len(embeddings) > 0:
-                self.X.extend(embeddings)
-                # 🔧 使用统一的字符串类型label
-                self.y.extend([user_label] * len(embeddings))
-                logger.info(f"  ✓ 成功处理 {len(embeddings)}/{len(images)} 张图像 (Label: '{user_label}')")
-            else:
+            if num_faces == 0:
+                # 同样记录"未检测到人脸"的结果,下次无需重复检测
+                for key, faces in results:
+                    new_cache[key] = (
+                        cache[key] if faces is None
+                        else np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+                    )
                 logger.warning(f"  ⚠ 用户 {user_label} 没有有效图像")
+                continue
+            
+            block = np.empty((num_faces, self.EMBEDDING_DIM), dtype=np.float32)
+            
+            # 命中缓存的行直接复制,未命中的人脸收集后批量提取
+            row = 0
+            miss_faces = []
+            miss_keys = []
+            for key, faces in results:
+                if faces is None:
+                    rows = cache[key]
+                    block[row:row + len(rows)] = rows
+                    row += len(rows)
+                    new_cache[key] = rows
+                else:
+                    miss_faces.extend(faces)
+                    miss_keys.append((key, len(faces)))
+            
+            miss_block = self.extract_embeddings_batch(miss_faces, out=block[row:])
+            num_computed += len(miss_faces)
+            
+            # 新计算的嵌入写回缓存
+            pos = 0
+            for key, count in miss_keys:
+                new_cache[key] = miss_block[pos:pos + count].copy()
+                pos += count
+            
+            emb_chunks.append(block)
+            # 🔧 使用统一的字符串类型label
+            label_chunks.append(np.full(num_faces, user_label, dtype=object))
+            logger.info(
+                f"  ✓ 成功处理 {num_faces}/{num_images} 张图像 "
+                f"(缓存命中 {num_hits}, Label: '{user_label}')"
+            )
+            del results, miss_faces  # 释放该用户的人脸图像
+        
+        self.X = (
+            np.concatenate(emb_chunks) if emb_chunks
+            else np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        )
+        emb_chunks.clear()
+        total = len(self.X)
+        
+        logger.info(f"FaceNet推理 {num_computed} 个样本,缓存复用 {total - num_computed} 个样本")
+        if use_cache and (num_computed > 0 or new_cache.keys() != cache.keys()):
+            self._save_embedding_cache(new_cache)
+        
+        # L2归一化(GPU半精度推理后统一在float32下重新归一化)
+        if total > 0:
+            norms = np.linalg.norm(self.X, axis=1, keepdims=True)
+            self.X /= np.maximum(norms, 1e-12)
         
-        # 转换为numpy数组
-        self.X = np.array(self.X)
         # 🔧 确保labels是object类型（字符串）
-        self.y = np.array(self.y, dtype=object)
+        self.y = (
+            np.concatenate(label_chunks) if label_chunks
+            else np.empty(0, dtype=object)
+        )
         
         logger.info("\n" + "=" * 60)
         logger.info(f"数据集加载完成:")
@@ -308,21 +839,47 @@ class FaceNetTrainer:
         # 编码标签
         y_encoded = self.label_encoder.fit_transform(self.y)
         
-        # 分割数据集
-        X_train, X_test, y_train, y_test = train_test_split(
-            self.X,
-            y_encoded,
-            test_size=test_size,
-            random_state=42,
-            stratify=y_encoded
-        )
+        # 分割数据集: 优先分层分割,部分用户样本过少无法分层时退回随机分割
+        try:
+            X_train, X_test, y_train, y_test = train_test_split(
+                self.X,
+                y_encoded,
+                test_size=test_size,
+                random_state=42,
+                stratify=y_encoded
+            )
+        except ValueError as e:
+            logger.warning(f"无法分层分割,改为随机分割: {e}")
+            X_train, X_test, y_train, y_test = train_test_split(
+                self.X,
+                y_encoded,
+                test_size=test_size,
+                random_state=42
+            )
         
         logger.info(f"训练集大小: {len(X_train)}")
         logger.info(f"测试集大小: {len(X_test)}")
         
         # 训练SVM
         logger.info("\n训练中...")
-        self.svm_model = SVC(kernel='linear', probability=True, random_state=42)
+        # liblinear训练复杂度约为O(n·d),远快于libsvm的SVC(kernel='linear');
+        # 样本数大于特征维度时求解原始问题(dual=False)更快
+        # 用sigmoid校准保留predict_proba(识别时按概率判断置信度),各折并行训练
+        # 校准的交叉验证折数不能超过训练集中样本最少的类别数(随机分割后可能很少)
+        n_samples, n_features = X_train.shape
+        min_class_count = np.bincount(y_train).min()
+        if min_class_count < 2:
+            raise ValueError("部分用户在训练集中的样本少于2个,无法进行概率校准,请为其补充图像")
+        cv = min(3, min_class_count)
+        if cv < 3:
+            logger.warning(f"部分用户训练样本较少,概率校准改为 {cv} 折交叉验证")
+        
+        self.svm_model = CalibratedClassifierCV(
+            LinearSVC(C=1.0, dual=n_samples <= n_features, random_state=42),
+            method='sigmoid',
+            cv=cv,
+            n_jobs=-1
+        )
         self.svm_model.fit(X_train, y_train)
         
         # 评估
@@ -356,10 +913,13 @@ class FaceNetTrainer:
         # 保存嵌入向量和标签
         embeddings_path = config.FACENET_EMBEDDINGS
         # 🔧 使用allow_pickle=True以支持object类型的labels
-        np.savez_compressed(
+        # 嵌入向量几乎不可压缩,不压缩保存,读写均省去zlib开销;
+        # label_classes为SVM类别编号对应的用户标签(LabelEncoder.classes_)
+        np.savez(
             embeddings_path,
-            embeddings=self.X,
-            labels=self.y
+            embeddings=self.X.astype(np.float32, copy=False),
+            labels=self.y,
+            label_classes=self.label_encoder.classes_
         )
         logger.info(f"✓ 嵌入数据已保存: {embeddings_path}")
         logger.info(f"  - Labels类型: {self.y.dtype}")
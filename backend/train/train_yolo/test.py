@@ -11,7 +11,7 @@ sys.path.insert(0, str(backend_dir))
 
 import cv2
 from config import config
-from train.common import YOLOFaceDetector
+from train.common import YOLOFaceDetector, VideoStream
 import logging
 
 # 配置日志
@@ -45,19 +45,25 @@ def test_yolo_realtime(
     logger.info(f"置信度阈值: {confidence_threshold}")
     logger.info("\n按 'q' 退出, 's' 截图保存\n")
     
-    # 初始化检测器
+    # 初始化检测器(实时场景优先使用导出的TensorRT/ONNX模型)
     detector = YOLOFaceDetector(
         model_path=model_path,
-        confidence_threshold=confidence_threshold
+        confidence_threshold=confidence_threshold,
+        prefer_exported=True
     )
     
-    # 打开摄像头
-    cap = cv2.VideoCapture(camera_index)
+    # 预热,避免首帧推理卡顿
+    detector.warmup()
+    
+    # 打开摄像头(后台线程读取,只保留最新帧,摄像头I/O与检测推理并行)
+    cap = VideoStream(camera_index)
     
     if not cap.isOpened():
         logger.error(f"无法打开摄像头 {camera_index}")
         return
     
+    cap.start()
+    
     frame_count = 0
     screenshot_count = 0
     
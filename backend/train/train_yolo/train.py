@@ -103,7 +103,58 @@ def train_yolo_face_detection(
         raise
 
 
+def export_yolo_model(
+    model_path: str = None,
+    export_format: str = "engine",
+    half: bool = True,
+    img_size: int = 640
+) -> str:
+    """
+    导出YOLO模型为TensorRT引擎或ONNX,导出文件与.pt同目录同名
+    
+    YOLOFaceDetector会自动优先加载导出的模型
+    
+    Args:
+        model_path: .pt模型路径,None则使用配置中的路径
+        export_format: 'engine'(TensorRT) 或 'onnx'
+        half: 是否导出FP16(仅TensorRT/GPU有效)
+        img_size: 导出的输入尺寸
+    
+    Returns:
+        导出文件路径
+    """
+    if model_path is None:
+        model_path = str(config.YOLO_MODEL)
+    
+    model = YOLO(model_path)
+    
+    if export_format == "engine":
+        try:
+            exported = model.export(format="engine", half=half, imgsz=img_size)
+            logger.info(f"✓ TensorRT引擎已导出: {exported}")
+            return exported
+        except Exception as e:
+            # 未安装TensorRT或无GPU时退回ONNX
+            logger.warning(f"TensorRT导出失败,改为导出ONNX: {e}")
+    
+    exported = model.export(format="onnx", imgsz=img_size)
+    logger.info(f"✓ ONNX模型已导出: {exported}")
+    return exported
+
+
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='YOLO人脸检测训练')
+    parser.add_argument('--export', type=str, default=None,
+                        choices=['engine', 'onnx'],
+                        help='仅导出已训练模型为TensorRT引擎或ONNX,不进行训练')
+    args = parser.parse_args()
+    
+    if args.export:
+        export_yolo_model(export_format=args.export)
+        sys.exit(0)
+    
     # 训练参数 (快速验证模式)
     EPOCHS = 3  # 快速验证,完整训练改为50-100
     BATCH_SIZE = 8  # 减小batch避免显存不足
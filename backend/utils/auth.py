@@ -2,24 +2,216 @@
 认证工具类
 提供密码加密、JWT Token生成和验证等功能
 """
-import bcrypt
-from datetime import datetime, timedelta
-from functools import wraps
-from flask import request, jsonify
-import jwt
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from flask import Response, request
 from config.settings import Config
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _jwt():
+    """
+    首次使用时再导入JWT实现,缩短服务冷启动时间
+    
+    jwt_rs(Rust实现,与PyJWT接口一致)未安装或JWT_BACKEND=pyjwt时使用PyJWT
+    """
+    if Config.JWT_BACKEND in ('auto', 'rust'):
+        try:
+            import jwt_rs
+            return jwt_rs
+        except ImportError:
+            if Config.JWT_BACKEND == 'rust':
+                logger.warning("未安装jwt_rs,使用PyJWT")
+    import jwt
+    return jwt
+
+
+class _TTLCache:
+    """线程安全的TTL缓存,超出容量时淘汰最早写入的条目"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """获取未过期的值,不存在或已过期返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+    
+    def set(self, key, value):
+        """写入值,过期时间不超过payload自身的exp"""
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        if isinstance(value, dict) and 'exp' in value:
+            expires_at = min(expires_at, now + value['exp'] - time.time())
+        
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key):
+        """删除值"""
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class _MemcachedCache:
+    """
+    基于Memcached的共享缓存,接口与_TTLCache一致;服务不可用时视为未命中
+    
+    Memcached通常没有访问认证,缓存值附带以SECRET_KEY计算的HMAC,
+    签名不匹配的条目(被篡改或伪造)一律视为未命中
+    """
+    
+    def __init__(self, servers: list, ttl: int, secret: bytes, prefix: str = 'jwt:'):
+        from pymemcache.client.hash import HashClient
+        
+        nodes = []
+        for server in servers:
+            host, _, port = server.strip().partition(':')
+            nodes.append((host, int(port or 11211)))
+        
+        self.ttl = ttl
+        self._secret = secret
+        self._prefix = prefix
+        self._client = HashClient(
+            nodes,
+            connect_timeout=0.2,
+            timeout=0.2,
+            ignore_exc=True,
+            serde=None
+        )
+    
+    def _key(self, key: bytes) -> str:
+        return self._prefix + key.hex()
+    
+    def _sign(self, key: bytes, data: bytes) -> bytes:
+        """对缓存键(含前缀)和值计算HMAC,防止条目被替换到其他Token或其他缓存名下"""
+        msg = self._prefix.encode('ascii') + key + b'.' + data
+        return hmac.new(self._secret, msg, hashlib.sha256).hexdigest().encode('ascii')
+    
+    def get(self, key):
+        """获取值,不存在或签名无效返回None"""
+        raw = self._client.get(self._key(key))
+        if not raw:
+            return None
+        
+        signature, sep, data = raw.partition(b'.')
+        if not sep or not hmac.compare_digest(signature, self._sign(key, data)):
+            logger.warning("Token缓存条目签名无效,已忽略")
+            return None
+        return json.loads(data)
+    
+    def set(self, key, value):
+        """写入值,过期时间不超过payload自身的exp"""
+        expire = min(self.ttl, int(value.get('exp', 0) - time.time()))
+        if expire > 0:
+            data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+            raw = self._sign(key, data) + b'.' + data
+            self._client.set(self._key(key), raw, expire=expire, noreply=True)
+    
+    def pop(self, key):
+        """删除值"""
+        self._client.delete(self._key(key), noreply=True)
+
+
+def _create_token_cache(ttl: int, maxsize: int = 10000, prefix: str = 'jwt:'):
+    """配置了AUTH_CACHE_SERVERS且安装pymemcache时使用共享缓存,否则使用进程内缓存"""
+    if Config.AUTH_CACHE_SERVERS:
+        try:
+            return _MemcachedCache(
+                Config.AUTH_CACHE_SERVERS,
+                ttl=ttl,
+                secret=Config.SECRET_KEY.encode('utf-8'),
+                prefix=prefix
+            )
+        except ImportError:
+            logger.warning("未安装pymemcache,Token缓存使用进程内缓存")
+    return _TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+# 已验证访问Token的payload缓存,避免同一Token每次请求都重新验签;
+# 访问Token短期有效,缓存时长与其有效期一致
+_token_cache = _create_token_cache(ttl=Config.ACCESS_TOKEN_EXPIRE_SECONDS)
+
+# 已登出(吊销)Token的黑名单,键为Token哈希,条目保留到Token自身过期为止;
+# 多进程部署时需配置AUTH_CACHE_SERVERS,黑名单才能在各进程间共享
+_token_denylist = _create_token_cache(
+    ttl=Config.REFRESH_TOKEN_EXPIRE_SECONDS,
+    maxsize=100000,
+    prefix='jwt-deny:'
+)
+
+# bcrypt在C层释放GIL,放入线程池后并发登录可以真正并行
+_BCRYPT_WORKERS = os.cpu_count() or 4
+_bcrypt_pool = ThreadPoolExecutor(max_workers=_BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+# 正在执行和排队的任务上限,超出时直接拒绝,避免大量登录请求堆积
+_bcrypt_slots = threading.BoundedSemaphore(_BCRYPT_WORKERS + 8)
+# 批量加密使用独立的小线程池,批量导入时不会占满登录校验的线程和排队名额
+_bcrypt_batch_pool = ThreadPoolExecutor(
+    max_workers=max(1, _BCRYPT_WORKERS // 2),
+    thread_name_prefix='bcrypt-batch'
+)
+
+
+class AuthBusyError(Exception):
+    """密码校验任务已满,调用方应返回503"""
+
 
 class AuthUtils:
     """认证工具类"""
     
     # JWT密钥和配置
     SECRET_KEY = Config.SECRET_KEY
+    # 预先编码为bytes,避免每次编解码时重复encode
+    _SECRET_BYTES = SECRET_KEY.encode('utf-8') if isinstance(SECRET_KEY, str) else SECRET_KEY
     ALGORITHM = 'HS256'
-    ACCESS_TOKEN_EXPIRE_HOURS = 24  # Token有效期24小时
+    ACCESS_TOKEN_EXPIRE_SECONDS = Config.ACCESS_TOKEN_EXPIRE_SECONDS  # 访问Token有效期
+    REFRESH_TOKEN_EXPIRE_SECONDS = Config.REFRESH_TOKEN_EXPIRE_SECONDS  # 刷新Token有效期
+    BCRYPT_COST = Config.BCRYPT_COST
+    BCRYPT_TIMEOUT = 2  # 等待密码校验结果的最长秒数
+    MAX_TOKEN_LENGTH = 4096  # 超过该长度的Token直接视为无效
+    MAX_PASSWORD_LENGTH = 256  # 明文密码最大字符数
+    BCRYPT_MAX_BYTES = 72  # bcrypt只使用密码的前72字节
     
-    @staticmethod
-    def hash_password(password: str) -> str:
+    @classmethod
+    def _encode_password(cls, password: str) -> bytes:
+        """
+        将明文密码编码为bcrypt输入
+        
+        先按字符数拒绝超长输入,避免为超大字符串分配内存;再截断到72字节,
+        与bcrypt自身的截断行为一致,旧哈希仍可验证
+        
+        Raises:
+            ValueError: 密码超过MAX_PASSWORD_LENGTH个字符
+        """
+        if len(password) > cls.MAX_PASSWORD_LENGTH:
+            raise ValueError(f'密码长度不能超过{cls.MAX_PASSWORD_LENGTH}位')
+        return password.encode('utf-8')[:cls.BCRYPT_MAX_BYTES]
+    
+    @classmethod
+    def hash_password(cls, password: str) -> str:
         """
         密码加密
         
@@ -28,58 +220,201 @@ class AuthUtils:
             
         Returns:
             加密后的密码哈希
+            
+        Raises:
+            ValueError: 密码过长
         """
-        salt = bcrypt.gensalt()
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
+        import bcrypt  # 延迟导入,缩短冷启动时间
+        
+        salt = bcrypt.gensalt(rounds=cls.BCRYPT_COST)
+        password_hash = bcrypt.hashpw(cls._encode_password(password), salt)
         return password_hash.decode('utf-8')
     
-    @staticmethod
-    def verify_password(password: str, password_hash: str) -> bool:
+    @classmethod
+    def hash_password_batch(cls, passwords: list) -> list:
+        """
+        批量加密密码(批量导入用户等场景)
+        
+        在独立的批量线程池中并行计算(最多占用一半CPU核),不影响登录校验;
+        返回顺序与输入一致
+        
+        Args:
+            passwords: 明文密码列表
+            
+        Returns:
+            加密后的密码哈希列表
+        """
+        return list(_bcrypt_batch_pool.map(cls.hash_password, passwords))
+    
+    @classmethod
+    def verify_password(cls, password: str, password_hash) -> bool:
         """
         验证密码
         
         Args:
             password: 明文密码
-            password_hash: 密码哈希
+            password_hash: 密码哈希(str或bytes,bytes时不再重复编码)
             
         Returns:
             密码是否正确
         """
+        import bcrypt  # 延迟导入,缩短冷启动时间
+        
+        try:
+            if isinstance(password_hash, str):
+                # bcrypt哈希只包含ASCII字符
+                password_hash = password_hash.encode('ascii')
+            return bcrypt.checkpw(cls._encode_password(password), password_hash)
+        except Exception:
+            return False
+    
+    @classmethod
+    def verify_password_batch(cls, pairs: list) -> list:
+        """
+        批量验证密码(批量导入核对等离线场景)
+        
+        与hash_password_batch共用批量线程池,不影响登录校验;返回顺序与输入一致
+        
+        Args:
+            pairs: [(明文密码, 密码哈希), ...]
+            
+        Returns:
+            每一对是否匹配的列表
+        """
+        return list(_bcrypt_batch_pool.map(lambda pair: cls.verify_password(*pair), pairs))
+    
+    @classmethod
+    def verify_password_async(cls, password: str, password_hash: str) -> Future:
+        """
+        在bcrypt线程池中验证密码
+        
+        Args:
+            password: 明文密码
+            password_hash: 密码哈希
+            
+        Returns:
+            结果为bool的Future,调用方使用 result(timeout=BCRYPT_TIMEOUT) 获取
+            
+        Raises:
+            AuthBusyError: 排队任务已满
+        """
+        if not _bcrypt_slots.acquire(blocking=False):
+            raise AuthBusyError('服务繁忙，请稍后重试')
+        
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+            future = _bcrypt_pool.submit(cls.verify_password, password, password_hash)
         except Exception:
+            _bcrypt_slots.release()
+            raise
+        
+        future.add_done_callback(lambda _: _bcrypt_slots.release())
+        return future
+    
+    @classmethod
+    def needs_rehash(cls, password_hash: str) -> bool:
+        """
+        判断密码哈希的计算成本是否低于当前配置
+        
+        Args:
+            password_hash: 密码哈希,格式 $2b$NN$<salt+hash>
+            
+        Returns:
+            是否需要用当前成本重新加密
+        """
+        parts = password_hash.split('$')
+        if len(parts) < 4 or not parts[2].isdigit():
             return False
+        return int(parts[2]) < cls.BCRYPT_COST
     
     @classmethod
-    def generate_token(cls, user_id: int, user_type: str, **extra_data) -> str:
+    def generate_token(
+        cls,
+        user_id: int,
+        user_type: str,
+        token_type: str = 'access',
+        **extra_data
+    ) -> str:
         """
         生成JWT Token
         
         Args:
             user_id: 用户ID
             user_type: 用户类型 ('admin' 或 'user')
+            token_type: 'access'(访问Token) 或 'refresh'(刷新Token)
             **extra_data: 额外的数据（如username）
             
         Returns:
             JWT Token字符串
         """
+        if token_type == 'refresh':
+            expire_seconds = cls.REFRESH_TOKEN_EXPIRE_SECONDS
+        else:
+            expire_seconds = cls.ACCESS_TOKEN_EXPIRE_SECONDS
+        
+        now = int(time.time())
         payload = {
             'user_id': user_id,
             'user_type': user_type,
-            'exp': datetime.utcnow() + timedelta(hours=cls.ACCESS_TOKEN_EXPIRE_HOURS),
-            'iat': datetime.utcnow()
+            'type': token_type,
+            'exp': now + expire_seconds,
+            'iat': now
         }
         
         # 添加额外数据
         payload.update(extra_data)
         
-        token = jwt.encode(payload, cls.SECRET_KEY, algorithm=cls.ALGORITHM)
+        token = _jwt().encode(payload, cls._SECRET_BYTES, algorithm=cls.ALGORITHM)
         return token
     
+    @classmethod
+    def generate_token_pair(cls, user_id: int, user_type: str, **extra_data) -> dict:
+        """
+        生成访问Token和刷新Token
+        
+        Args:
+            user_id: 用户ID
+            user_type: 用户类型 ('admin' 或 'user')
+            **extra_data: 写入访问Token的额外数据（如username）
+            
+        Returns:
+            {'access': 访问Token, 'refresh': 刷新Token}
+        """
+        return {
+            'access': cls.generate_token(user_id, user_type, **extra_data),
+            'refresh': cls.generate_token(user_id, user_type, token_type='refresh')
+        }
+    
+    @staticmethod
+    def _token_cache_key(token: str) -> bytes:
+        """Token缓存键(只保存哈希,不保存原始Token)"""
+        return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+    
+    @classmethod
+    def _decode(cls, token: str) -> dict:
+        """
+        验签并解码JWT Token
+        
+        Raises:
+            ValueError: Token已过期或无效
+        """
+        # 结构预检: header.payload.signature,明显格式错误的Token不进入解码和验签
+        if token.count('.') != 2 or len(token) > cls.MAX_TOKEN_LENGTH:
+            raise ValueError('Token无效')
+        
+        jwt = _jwt()
+        try:
+            return jwt.decode(token, cls._SECRET_BYTES, algorithms=[cls.ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise ValueError('Token已过期')
+        except jwt.InvalidTokenError:
+            raise ValueError('Token无效')
+    
     @classmethod
     def decode_token(cls, token: str) -> dict:
         """
-        解码JWT Token
+        解码访问Token
+        
+        验证通过的payload在有效期内缓存,命中缓存时只重新检查exp
         
         Args:
             token: JWT Token字符串
@@ -88,16 +423,74 @@ class AuthUtils:
             解码后的payload字典
             
         Raises:
-            jwt.ExpiredSignatureError: Token已过期
-            jwt.InvalidTokenError: Token无效
+            ValueError: Token已过期或无效
         """
-        try:
-            payload = jwt.decode(token, cls.SECRET_KEY, algorithms=[cls.ALGORITHM])
-            return payload
-        except jwt.ExpiredSignatureError:
+        cache_key = cls._token_cache_key(token)
+        if _token_denylist.get(cache_key) is not None:
+            raise ValueError('Token已失效')
+        
+        payload = _token_cache.get(cache_key)
+        
+        if payload is not None:
+            # 缓存条目不能超过Token自身的有效期
+            if payload.get('exp', 0) > time.time():
+                return dict(payload)
+            _token_cache.pop(cache_key)
             raise ValueError('Token已过期')
-        except jwt.InvalidTokenError:
+        
+        payload = cls._decode(token)
+        
+        # 刷新Token不能用于访问接口(未带type的旧Token视为访问Token)
+        if payload.get('type', 'access') != 'access':
+            raise ValueError('Token无效')
+        
+        _token_cache.set(cache_key, payload)
+        return dict(payload)
+    
+    @classmethod
+    def decode_refresh_token(cls, token: str) -> dict:
+        """
+        解码刷新Token(使用频率低,不经过验证缓存,只检查黑名单)
+        
+        Args:
+            token: 刷新Token字符串
+            
+        Returns:
+            解码后的payload字典
+            
+        Raises:
+            ValueError: Token已过期或无效
+        """
+        if _token_denylist.get(cls._token_cache_key(token)) is not None:
+            raise ValueError('Token已失效')
+        
+        payload = cls._decode(token)
+        
+        if payload.get('type') != 'refresh':
             raise ValueError('Token无效')
+        
+        return payload
+    
+    @classmethod
+    def invalidate(cls, token: str):
+        """
+        吊销Token(登出时调用,访问Token和刷新Token均可)
+        
+        Token哈希加入黑名单直到其自身过期,decode_token/decode_refresh_token
+        之后都会拒绝该Token;同时清除其验证缓存
+        
+        Args:
+            token: JWT Token字符串
+        """
+        try:
+            payload = cls._decode(token)
+        except ValueError:
+            # 已过期或无效的Token本就无法通过验证
+            return
+        
+        cache_key = cls._token_cache_key(token)
+        _token_denylist.set(cache_key, {'exp': payload.get('exp', 0)})
+        _token_cache.pop(cache_key)
     
     @classmethod
     def get_token_from_request(cls) -> str:
@@ -110,18 +503,28 @@ class AuthUtils:
         Raises:
             ValueError: 未提供Token或格式错误
         """
+        # 同一请求内只解析一次请求头
+        token = getattr(request, '_auth_token', None)
+        if token is not None:
+            return token
+        
         auth_header = request.headers.get('Authorization')
         
         if not auth_header:
             raise ValueError('未提供认证Token')
         
+        # "Bearer " 前缀之外的长度超出Token上限时不再解析
+        if len(auth_header) > cls.MAX_TOKEN_LENGTH + 16:
+            raise ValueError('Token格式错误')
+        
         # 格式: "Bearer <token>"
-        parts = auth_header.split()
+        scheme, sep, token = auth_header.partition(' ')
         
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
+        if not sep or not token or scheme.lower() != 'bearer' or ' ' in token:
             raise ValueError('Token格式错误')
         
-        return parts[1]
+        request._auth_token = token
+        return token
     
     @classmethod
     def get_current_user(cls) -> dict:
@@ -134,92 +537,89 @@ class AuthUtils:
         Raises:
             ValueError: Token无效或已过期
         """
+        # 同一请求内多次获取当前用户时复用已验证的payload
+        payload = getattr(request, '_auth_payload', None)
+        if payload is not None:
+            return payload
+        
         token = cls.get_token_from_request()
         payload = cls.decode_token(token)
+        request._auth_payload = payload
         return payload
 
 
-def admin_required(f):
+def _error_body(message: str) -> bytes:
+    """序列化认证失败的响应体"""
+    return json.dumps({'success': False, 'message': message}, separators=(',', ':')).encode('utf-8')
+
+
+# 认证失败的响应体在导入时序列化好,大量401请求时不再重复构造和编码
+_UNAUTHORIZED_BODIES = {
+    message: _error_body(message)
+    for message in ('未提供认证Token', 'Token格式错误', 'Token已过期', 'Token无效', '认证失败')
+}
+_FORBIDDEN_BODY = _error_body('需要管理员权限')
+
+
+def _unauthorized(message: str) -> Response:
+    """401响应"""
+    body = _UNAUTHORIZED_BODIES.get(message)
+    if body is None:
+        body = _error_body(message)
+    return Response(body, status=401, mimetype='application/json')
+
+
+def _forbidden() -> Response:
+    """403响应"""
+    return Response(_FORBIDDEN_BODY, status=403, mimetype='application/json')
+
+
+def require_auth(role: str = None, optional: bool = False):
     """
-    管理员权限装饰器
-    只有管理员可以访问
+    认证装饰器工厂
+    
+    Args:
+        role: 要求的用户类型,'admin' 时用户信息以current_admin传入,否则以current_user传入
+        optional: 为True时未提供Token或Token无效也继续执行,current_user为None
+        
+    Returns:
+        装饰器
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            user_info = AuthUtils.get_current_user()
-            
-            if user_info.get('user_type') != 'admin':
-                return jsonify({
-                    'success': False,
-                    'message': '需要管理员权限'
-                }), 403
-            
-            # 将用户信息传递给路由函数
-            kwargs['current_admin'] = user_info
-            return f(*args, **kwargs)
+    kwarg_name = 'current_admin' if role == 'admin' else 'current_user'
+    
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                user_info = AuthUtils.get_current_user()
+            except Exception as e:
+                if optional:
+                    # 没有Token或Token无效，继续执行
+                    kwargs[kwarg_name] = None
+                    return f(*args, **kwargs)
+                if isinstance(e, ValueError):
+                    logger.warning("认证失败: %s", e)
+                    return _unauthorized(str(e))
+                logger.exception("认证失败 (未知异常): %s", e)
+                return _unauthorized('认证失败')
             
-        except ValueError as e:
-            print(f"✗ 认证失败 (ValueError): {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': str(e)
-            }), 401
-        except Exception as e:
-            print(f"✗ 认证失败 (Exception): {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                'success': False,
-                'message': f'认证失败: {str(e)}'
-            }), 401
-    
-    return decorated_function
-
-
-def user_required(f):
-    """
-    普通用户权限装饰器
-    需要登录（管理员或普通用户）
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            user_info = AuthUtils.get_current_user()
+            if role is not None and user_info.get('user_type') != role:
+                return _forbidden()
             
             # 将用户信息传递给路由函数
-            kwargs['current_user'] = user_info
+            kwargs[kwarg_name] = user_info
             return f(*args, **kwargs)
-            
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'message': str(e)
-            }), 401
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': '认证失败'
-            }), 401
+        
+        return decorated_function
     
-    return decorated_function
+    return decorator
 
 
-def optional_auth(f):
-    """
-    可选认证装饰器
-    如果提供了Token则验证，否则继续执行
-    用于打卡等功能（可以无需登录）
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            user_info = AuthUtils.get_current_user()
-            kwargs['current_user'] = user_info
-        except:
-            # 没有Token或Token无效，继续执行
-            kwargs['current_user'] = None
-        
-        return f(*args, **kwargs)
-    
-    return decorated_function
+# 管理员权限装饰器: 只有管理员可以访问
+admin_required = require_auth(role='admin')
+
+# 普通用户权限装饰器: 需要登录（管理员或普通用户）
+user_required = require_auth()
+
+# 可选认证装饰器: 如果提供了Token则验证，否则继续执行（用于打卡等无需登录的功能）
+optional_auth = require_auth(optional=True)
@@ -2,7 +2,7 @@
  * API客户端
  * 封装所有后端API调用
  */
-import axios, { type AxiosInstance, AxiosError } from 'axios';
+import axios, { type AxiosInstance, type InternalAxiosRequestConfig, AxiosError } from 'axios';
 import type { ApiResponse, User, Attendance, Statistics, CheckInResult, SystemStatus, PaginatedData } from '../types';
 
 // API基础URL
@@ -48,13 +48,55 @@ apiClient.interceptors.request.use(
   }
 );
 
+// 刷新访问Token（多个请求同时返回401时共用一次刷新）
+let refreshPromise: Promise<string> | null = null;
+
+const refreshAccessToken = (): Promise<string> => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    const userType = localStorage.getItem('userType');
+    const url = userType === 'admin' ? '/api/admin/refresh' : '/api/auth/refresh';
+
+    refreshPromise = axios
+      .post<ApiResponse<{ token: string }>>(`${API_BASE_URL}${url}`, { refresh_token: refreshToken })
+      .then((res) => {
+        const token = res.data.data.token;
+        localStorage.setItem('token', token);
+        return token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // 响应拦截器
 apiClient.interceptors.response.use(
   (response) => {
     console.log('API响应:', response.config.url, '状态:', response.status);
     return response.data;
   },
-  (error: AxiosError<ApiResponse>) => {
+  async (error: AxiosError<ApiResponse>) => {
+    // 访问Token过期时用刷新Token换取新Token并重试一次（登录接口除外）
+    const originalRequest = error.config as (InternalAxiosRequestConfig & { _retry?: boolean }) | undefined;
+    if (
+      error.response?.status === 401 &&
+      originalRequest &&
+      !originalRequest._retry &&
+      !originalRequest.url?.endsWith('/login') &&
+      localStorage.getItem('refreshToken')
+    ) {
+      originalRequest._retry = true;
+      try {
+        const token = await refreshAccessToken();
+        originalRequest.headers.Authorization = `Bearer ${token}`;
+        return apiClient(originalRequest);
+      } catch (refreshError) {
+        console.error('刷新Token失败:', refreshError);
+      }
+    }
+
     console.error('API错误:', error.config?.url, error.response?.status);
     console.error('错误详情:', error.response?.data);
     const message = error.response?.data?.message || error.message || '请求失败';
@@ -67,15 +109,15 @@ apiClient.interceptors.response.use(
 export const authApi = {
   // 管理员登录
   adminLogin: (username: string, password: string) => {
-    return apiClient.post<any, ApiResponse<{ token: string; admin: any }>>('/api/admin/login', {
+    return apiClient.post<any, ApiResponse<{ token: string; refresh_token: string; admin: any }>>('/api/admin/login', {
       username,
       password,
     });
   },
 
   // 管理员登出
-  adminLogout: () => {
-    return apiClient.post<any, ApiResponse>('/api/admin/logout');
+  adminLogout: (refreshToken?: string | null) => {
+    return apiClient.post<any, ApiResponse>('/api/admin/logout', { refresh_token: refreshToken });
   },
 
   // 获取当前管理员信息
@@ -93,15 +135,15 @@ export const authApi = {
 
   // 普通用户登录
   userLogin: (username: string, password: string) => {
-    return apiClient.post<any, ApiResponse<{ token: string; user: User }>>('/api/auth/login', {
+    return apiClient.post<any, ApiResponse<{ token: string; refresh_token: string; user: User }>>('/api/auth/login', {
       username,
       password,
     });
   },
 
   // 普通用户登出
-  userLogout: () => {
-    return apiClient.post<any, ApiResponse>('/api/auth/logout');
+  userLogout: (refreshToken?: string | null) => {
+    return apiClient.post<any, ApiResponse>('/api/auth/logout', { refresh_token: refreshToken });
   },
 
   // 获取当前用户信息
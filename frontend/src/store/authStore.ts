@@ -34,10 +34,11 @@ export const useAuthStore = create<AuthState>()(
       adminLogin: async (username: string, password: string) => {
         try {
           const response = await authApi.adminLogin(username, password);
-          const { token, admin } = response.data;
+          const { token, refresh_token, admin } = response.data;
 
           // 保存Token到localStorage
           localStorage.setItem('token', token);
+          localStorage.setItem('refreshToken', refresh_token);
           localStorage.setItem('userType', 'admin');
 
           set({
@@ -56,10 +57,11 @@ export const useAuthStore = create<AuthState>()(
       userLogin: async (username: string, password: string) => {
         try {
           const response = await authApi.userLogin(username, password);
-          const { token, user } = response.data;
+          const { token, refresh_token, user } = response.data;
 
           // 保存Token到localStorage
           localStorage.setItem('token', token);
+          localStorage.setItem('refreshToken', refresh_token);
           localStorage.setItem('userType', 'user');
 
           set({
@@ -77,13 +79,14 @@ export const useAuthStore = create<AuthState>()(
       // 登出
       logout: () => {
         const { userType } = get();
+        const refreshToken = localStorage.getItem('refreshToken');
 
-        // 调用后端登出API
+        // 调用后端登出API(同时吊销刷新Token)
         try {
           if (userType === 'admin') {
-            authApi.adminLogout();
+            authApi.adminLogout(refreshToken);
           } else if (userType === 'user') {
-            authApi.userLogout();
+            authApi.userLogout(refreshToken);
           }
         } catch (error) {
           console.error('登出API调用失败:', error);
@@ -91,6 +94,7 @@ export const useAuthStore = create<AuthState>()(
 
         // 清除本地存储
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
         localStorage.removeItem('userType');
 
         set({